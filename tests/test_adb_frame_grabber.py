@@ -0,0 +1,170 @@
+import time
+
+import cv2
+import numpy
+import pytest
+
+from ubot.frame_buffer import FrameBuffer
+from ubot.taskmanager import TaskManager
+from ubot.image import Sprite
+from ubot.sprite_locator import SpriteLocator
+from ubot.frame_grabbers.adb_frame_grabber import ADBFrameGrabber, ADBFrameGrabberError, decode_raw_screencap, _read_dump
+
+
+def _make_screencap(width, height, pixel_format, header_size, bytes_per_pixel=4):
+    header = numpy.array([width, height, pixel_format, 1][:header_size // 4], dtype="<u4").tobytes()
+    pixels = numpy.arange(width * height * bytes_per_pixel, dtype=numpy.uint8).tobytes()
+
+    return bytearray(header + pixels)
+
+
+@pytest.mark.parametrize("header_size", [12, 16])
+def test_decode_raw_screencap_should_view_pixels_of_buffer(header_size):
+    buffer = _make_screencap(8, 6, 1, header_size)
+
+    pixels, pixel_format = decode_raw_screencap(buffer)
+
+    assert pixel_format == 1
+    assert pixels.shape == (6, 8, 4)
+    assert pixels[0, 1, 0] == 4
+    assert numpy.shares_memory(pixels, numpy.frombuffer(buffer, dtype=numpy.uint8))
+
+
+def test_decode_raw_screencap_should_reject_truncated_buffer():
+    with pytest.raises(ADBFrameGrabberError):
+        decode_raw_screencap(_make_screencap(8, 6, 1, 12)[:-10])
+
+
+def test_read_dump_should_convert_memory_mapped_dump(tmp_path):
+    dump_path = tmp_path / "screen-0.dump"
+    dump_path.write_bytes(_make_screencap(8, 6, 1, 16))
+
+    frame_data = _read_dump(str(dump_path))
+
+    assert frame_data.shape == (6, 8, 3)
+    assert list(frame_data[0, 1]) == [6, 5, 4]
+
+
+@pytest.fixture(autouse=True)
+def frame_buffer_instance():
+    """
+    Grabbers get FrameBuffer's instance, which may have been made by another test with another size
+    """
+    FrameBuffer.instance = None
+    yield
+    FrameBuffer.instance = None
+
+    for name in ("frame-grabber-worker", "frame-grabber-hand-off"):
+        TaskManager.tasks.pop(name, None)
+
+
+class _FakeADBClient:
+
+    def __init__(self, failures=()):
+        self.captures = 0
+        self.failures = failures
+
+    @property
+    def screencap(self):
+        self.captures += 1
+
+        if self.captures in self.failures:
+            raise RuntimeError("device offline")
+
+        return cv2.imencode(".png", numpy.full((36, 64), self.captures % 256, dtype=numpy.uint8))[1].tobytes()
+
+
+def test_frame_grabber_pipeline_should_hand_off_frames_in_capture_order():
+    config = {
+        "Emulator": {"SharedFolders": None},
+        "FrameBuffer": {"Size": 50},
+        "FrameGrabber": {"CaptureMode": "png", "DumpFiles": 3, "DecodeWorkers": 3},
+        "SpriteLocator": {"WorkingScale": 1.0}
+    }
+
+    FrameBuffer.setup(config)
+    frame_buffer = FrameBuffer.get_instance()
+
+    frame_grabber = ADBFrameGrabber(_FakeADBClient(), config, width=64, height=36, fps=500)
+    frame_grabber.start()
+    time.sleep(0.3)
+    frame_grabber.stop()
+
+    values = [int(frame.image_data[0, 0]) for frame in reversed(frame_buffer.frames)]
+
+    assert len(values) > 10
+    assert values == sorted(values)
+
+
+def test_frame_grabber_pipeline_should_keep_capturing_after_failed_capture():
+    config = {
+        "Emulator": {"SharedFolders": None},
+        "FrameBuffer": {"Size": 50},
+        "FrameGrabber": {"CaptureMode": "png", "DumpFiles": 3, "DecodeWorkers": 1},
+        "SpriteLocator": {"WorkingScale": 1.0}
+    }
+
+    FrameBuffer.setup(config)
+    frame_buffer = FrameBuffer.get_instance()
+
+    frame_grabber = ADBFrameGrabber(_FakeADBClient(failures=(2, 3)), config, width=64, height=36, fps=200)
+    frame_grabber.start()
+    time.sleep(0.2)
+    frame_grabber.stop()
+
+    values = [int(frame.image_data[0, 0]) for frame in reversed(frame_buffer.frames)]
+
+    assert values[0] == 1
+    assert values[1] == 4
+    assert len(values) > 5
+
+
+def test_read_dump_should_convert_rgb565_dump(tmp_path):
+    dump_path = tmp_path / "screen-0.dump"
+    dump_path.write_bytes(_make_screencap(8, 6, 4, 16, bytes_per_pixel=2))
+
+    frame_data = _read_dump(str(dump_path))
+
+    assert frame_data.shape == (6, 8, 3)
+
+
+def test_frame_grabber_should_keep_enough_dump_files_for_pipeline():
+    config = {
+        "Emulator": {"SharedFolders": ["/sdcard/Pictures", "shared"]},
+        "FrameBuffer": {"Size": 5},
+        "FrameGrabber": {"CaptureMode": "png", "DumpFiles": 1, "DecodeWorkers": 2},
+        "SpriteLocator": {"WorkingScale": 1.0}
+    }
+
+    FrameBuffer.setup(config)
+
+    assert ADBFrameGrabber(_FakeADBClient(), config).dump_files == 3
+
+
+class _FakeColorADBClient:
+
+    def __init__(self, screen):
+        self.screen = screen
+
+    @property
+    def screencap(self):
+        return cv2.imencode(".png", self.screen)[1].tobytes()
+
+
+def test_png_capture_should_be_found_by_exact_engine_with_grayscale_sprite():
+    config = {
+        "Emulator": {"SharedFolders": None},
+        "FrameBuffer": {"Size": 5},
+        "FrameGrabber": {"CaptureMode": "png", "DumpFiles": 3, "DecodeWorkers": 1},
+        "SpriteLocator": {"WorkingScale": 1.0}
+    }
+
+    FrameBuffer.setup(config)
+
+    random = numpy.random.default_rng(0)
+    screen = cv2.GaussianBlur(random.integers(0, 255, (720, 1280, 3), dtype=numpy.uint8), (5, 5), 0)
+    sprite = Sprite("crop", screen[300:340, 500:560].copy())
+
+    frame = ADBFrameGrabber(_FakeColorADBClient(screen), config).grab_frame()
+
+    assert SpriteLocator().locate(sprite, frame, engine="exact", im_mode="grayscale") == [(500, 300, 60, 40)]
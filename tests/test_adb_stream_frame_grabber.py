@@ -0,0 +1,60 @@
+import io
+import time
+
+import numpy
+
+from ubot.image import Frame
+from ubot.frame_buffer import FrameBuffer
+from ubot.frame_grabbers.adb_stream_frame_grabber import ADBStreamFrameGrabber, _read_exactly
+
+
+class _ChunkedStream(io.RawIOBase):
+    """
+    Pipe-like stream, returns at most chunk_size bytes per read
+    """
+
+    def __init__(self, data, chunk_size):
+        self.data = io.BytesIO(data)
+        self.chunk_size = chunk_size
+
+    def readinto(self, buffer):
+        chunk = self.data.read(min(len(buffer), self.chunk_size))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def test_read_exactly_should_read_whole_frames_from_partial_reads():
+    stream = _ChunkedStream(bytes(range(10)) * 2 + b"\x01", chunk_size=3)
+
+    assert _read_exactly(stream, 10) == bytearray(range(10))
+    assert _read_exactly(stream, 10) == bytearray(range(10))
+    assert _read_exactly(stream, 10) is None
+
+
+class _IdleDecoder:
+    """
+    Decoder task of a stream which sent one frame, then nothing (static screen)
+    """
+
+    name = "idle-decoder"
+
+
+def test_grab_frame_should_return_latest_frame_immediately_on_idle_stream():
+    FrameBuffer.setup({"FrameBuffer": {"Size": 5}})
+    frame_buffer = FrameBuffer.get_instance()
+
+    config = {"SpriteLocator": {"WorkingScale": 1.0}}
+    frame_grabber = ADBStreamFrameGrabber(None, config, width=64, height=36)
+    frame_grabber._decoder = _IdleDecoder()
+    frame_grabber._hand_off(Frame(numpy.zeros((36, 64), dtype=numpy.uint8)))
+
+    started = time.perf_counter()
+    frames = [frame_grabber.grab_frame() for _ in range(3)]
+
+    assert time.perf_counter() - started < 0.5
+    assert frames[0] is frames[1] is frames[2]
+
+    for frame in frames:
+        frame_buffer.add_frame(frame)
+
+    assert sum(frame is frames[0] for frame in frame_buffer.frames) == 1
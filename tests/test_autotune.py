@@ -0,0 +1,30 @@
+import cv2
+import numpy
+
+from ubot.autotune import run_autotune
+from ubot.package_loader import Package
+
+
+def test_run_autotune_should_persist_reliable_options_for_found_sprites(tmp_path):
+    random = numpy.random.default_rng(0)
+
+    (tmp_path / "sprites").mkdir()
+    (tmp_path / "frames").mkdir()
+
+    for i in range(2):
+        frame_data = cv2.GaussianBlur(random.integers(0, 255, (180, 320, 3), dtype=numpy.uint8), (7, 7), 0)
+        cv2.imwrite(str(tmp_path / "frames" / f"frame_{i}.png"), frame_data)
+
+    cv2.imwrite(str(tmp_path / "sprites" / "button.png"), frame_data[40:104, 100:196])
+    cv2.imwrite(str(tmp_path / "sprites" / "missing.png"), random.integers(0, 255, (32, 32, 3), dtype=numpy.uint8))
+
+    package = Package("pkg", str(tmp_path), None)
+    results = run_autotune(package, str(tmp_path / "frames"), repeat=1)
+
+    assert results["missing"] is None
+    assert results["button"]["found"] == 1
+    assert results["button"]["latency_ms"] <= results["button"]["reference_latency_ms"]
+
+    package = Package("pkg", str(tmp_path), None)
+    assert package.sprites["button"].metadata["tuned"] == results["button"]["options"]
+    assert "tuned" not in package.sprites["missing"].metadata
@@ -0,0 +1,46 @@
+import json
+
+import cv2
+import numpy
+
+from ubot.benchmark import run_benchmark, compare_results, make_cases
+
+
+def _make_corpus(corpus_path, cases=None):
+    random = numpy.random.default_rng(0)
+
+    frame_data = cv2.GaussianBlur(random.integers(0, 255, (180, 320, 3), dtype=numpy.uint8), (7, 7), 0)
+    sprite_data = frame_data[40:72, 100:148].copy()
+
+    (corpus_path / "frames").mkdir()
+    (corpus_path / "sprites" / "menu").mkdir(parents=True)
+
+    cv2.imwrite(str(corpus_path / "frames" / "frame_01.png"), frame_data)
+    cv2.imwrite(str(corpus_path / "sprites" / "menu" / "button.png"), sprite_data)
+
+    if cases is not None:
+        (corpus_path / "cases.json").write_text(json.dumps(cases))
+
+
+def test_make_cases_should_combine_all_options():
+    cases = make_cases(dict(im_mode=[None, "grayscale"], best_match=[True, False]))
+
+    assert len(cases) == 4
+    assert dict(im_mode="grayscale", best_match=False) in cases
+
+
+def test_run_benchmark_should_report_latency_of_each_case(tmp_path):
+    _make_corpus(tmp_path, cases=[dict(im_mode="grayscale", threshold=0.9), dict(threshold=0.9, best_match=False)])
+
+    results = run_benchmark(str(tmp_path), repeat=2)
+
+    assert [case["options"] for case in results["cases"]] == [dict(im_mode="grayscale", threshold=0.9),
+                                                             dict(threshold=0.9, best_match=False)]
+
+    for case in results["cases"]:
+        assert case["calls"] == 2 and case["found"] == 1
+        assert case["p50_ms"] <= case["p99_ms"]
+        assert case["peak_memory_kb"] > 0
+
+    comparison = compare_results(results, json.loads(json.dumps(results)))
+    assert [c["speedup"] for c in comparison] == [1.0, 1.0]
@@ -0,0 +1,55 @@
+import types
+
+import cv2
+import numpy
+
+from ubot.bots.bot import Bot
+from ubot.image import Frame, Sprite
+
+
+CONFIG = {
+    "FrameBuffer": {"Size": 5},
+    "SpriteLocator": {"Workers": 1, "WorkingScale": 0.5},
+    "VariantCache": {"Budget": 256}
+}
+
+
+def test_seen_should_take_and_return_device_coordinates_at_working_scale():
+    random = numpy.random.default_rng(0)
+    device_frame = cv2.GaussianBlur(random.integers(0, 255, (720, 1280), dtype=numpy.uint8), (7, 7), 0)
+    sprite_data = device_frame[400:496, 800:928]
+
+    package = types.SimpleNamespace(
+        priors=None,
+        working_scale=0.5,
+        sprites={"button": Sprite.rescale(Sprite("button", sprite_data), 0.5)}
+    )
+    bot = Bot(CONFIG, package=package)
+
+    frame = Frame(cv2.resize(device_frame, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA))
+
+    assert bot.seen("button", frame=frame, threshold=0.9) == [(800, 400, 128, 96)]
+    assert bot.seen("button", frame=frame, threshold=0.9, region=(760, 360, 240, 200)) == [(800, 400, 128, 96)]
+    assert bot.seen("button", frame=frame, threshold=0.9, region=(0, 0, 400, 300)) == []
+    assert bot.first_seen(["button"], frame=frame, threshold=0.9) == ("button", [(800, 400, 128, 96)])
+
+
+def test_bank_should_take_and_return_device_coordinates_at_working_scale():
+    random = numpy.random.default_rng(0)
+    device_frame = cv2.GaussianBlur(random.integers(0, 255, (720, 1280), dtype=numpy.uint8), (7, 7), 0)
+
+    package = types.SimpleNamespace(
+        priors=None,
+        working_scale=0.5,
+        sprites={
+            "icons/a": Sprite.rescale(Sprite("icons/a", device_frame[400:496, 800:928]), 0.5),
+            "icons/b": Sprite.rescale(Sprite("icons/b", device_frame[100:196, 200:328]), 0.5)
+        }
+    )
+    bot = Bot(CONFIG, package=package)
+
+    frame = Frame(cv2.resize(device_frame, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA))
+    icons_seen = bot.bank(["icons/a", "icons/b"])
+
+    assert icons_seen(frame=frame, threshold=0.9) == {"icons/a": [(800, 400, 128, 96)], "icons/b": [(200, 100, 128, 96)]}
+    assert icons_seen(frame=frame, threshold=0.9, region=(760, 360, 240, 200)) == {"icons/a": [(800, 400, 128, 96)], "icons/b": []}
@@ -0,0 +1,9 @@
+from ubot.coordinates import non_max_suppression
+
+
+def test_non_max_suppression_should_keep_strongest_of_each_cluster():
+    coords = [(10, 10, 5, 5), (12, 11, 5, 5), (100, 100, 5, 5), (11, 10, 5, 5), (103, 98, 5, 5)]
+    scores = [0.91, 0.97, 0.88, 0.95, 0.93]
+
+    assert non_max_suppression(coords, scores, 10) == [(12, 11, 5, 5), (103, 98, 5, 5)]
+    assert non_max_suppression([], [], 10) == []
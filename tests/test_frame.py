@@ -0,0 +1,90 @@
+import gc
+import tracemalloc
+import weakref
+
+import numpy
+
+from ubot.image import Frame
+from ubot.frame_buffer import FrameBuffer
+
+
+FRAME_SIZE = (360, 640)
+
+
+def _capture(frame_buffer, count, seed=0):
+    random = numpy.random.default_rng(seed)
+
+    for _ in range(count):
+        frame_data = random.integers(0, 256, FRAME_SIZE, dtype=numpy.uint8)
+        frame_buffer.add_frame(Frame(frame_data, previous_frame=frame_buffer.previous_frame))
+
+
+def test_frame_should_not_keep_previous_frame_alive():
+    previous_frame = Frame(numpy.zeros(FRAME_SIZE, dtype=numpy.uint8))
+    reference = weakref.ref(previous_frame)
+
+    frame = Frame(numpy.zeros(FRAME_SIZE, dtype=numpy.uint8), previous_frame=previous_frame)
+    del previous_frame
+    gc.collect()
+
+    assert reference() is None
+    assert frame.similarity == 1.0
+    assert not hasattr(frame, "__dict__")
+
+
+def test_frame_should_compute_change_from_previous_frame_when_read():
+    frame_data = numpy.random.default_rng(0).integers(0, 256, FRAME_SIZE, dtype=numpy.uint8)
+    previous_frame = Frame(frame_data)
+
+    changed_data = frame_data.copy()
+    changed_data[32:64, 64:96] = 0
+
+    assert Frame(frame_data.copy(), previous_frame=previous_frame).similarity == 1.0
+
+    frame = Frame(changed_data, previous_frame=previous_frame)
+    change_map = frame.change_map()
+
+    assert 0.99 < frame.similarity < 1.0
+    assert change_map.shape == (-(-FRAME_SIZE[0] // 16), -(-FRAME_SIZE[1] // 16))
+    assert list(zip(*numpy.nonzero(change_map))) == [(2, 4), (2, 5), (3, 4), (3, 5)]
+
+
+def test_frame_change_map_should_cover_edges_not_multiple_of_tile_size():
+    frame_data = numpy.full(FRAME_SIZE, 100, dtype=numpy.uint8)
+    previous_frame = Frame(frame_data)
+
+    changed_data = frame_data.copy()
+    changed_data[354:360, 100:140] = 200
+    changed_data[0:16, 636:640] = 0
+
+    frame = Frame(changed_data, previous_frame=previous_frame)
+
+    assert list(zip(*numpy.nonzero(frame.change_map()))) == [(0, 39), (22, 6), (22, 7), (22, 8)]
+    assert frame.similarity < 1.0
+
+
+def test_frame_buffer_memory_should_be_bounded_by_its_size():
+    frame_buffer = FrameBuffer(size=3)
+    frame_bytes = FRAME_SIZE[0] * FRAME_SIZE[1]
+
+    tracemalloc.start()
+    try:
+        _capture(frame_buffer, 5)
+        gc.collect()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        _capture(frame_buffer, 60, seed=1)
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert current - baseline < frame_bytes
+    assert frame_buffer.frames[0].sequence - frame_buffer.frames[-1].sequence == 2
+
+
+def test_frame_similarity_should_not_depend_on_previous_frame_being_alive():
+    frame_buffer = FrameBuffer(size=1)
+    _capture(frame_buffer, 3)
+
+    assert frame_buffer.frames[0].similarity is not None
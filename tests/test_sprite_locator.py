@@ -1,9 +1,12 @@
 import pytest
 
 import cv2
+import numpy
 
-from ubot.image import Frame, Sprite
+from ubot.image import Image, Frame, Sprite
 from ubot.sprite_locator import SpriteLocator
+from ubot.location_priors import LocationPriors
+from ubot.scale_memory import ScaleMemory
 
 
 def test_locate_should_find_atleast_one_result():
@@ -21,3 +24,302 @@ def test_locate_should_find_atleast_one_result():
     sprite = Sprite.frompath("./tests/sprites/enemy_l.png", "enemy_l")
     regions = locator.locate(sprite, frame, m_scale=0.6, threshold=0.7, return_list=True)
     assert len(regions) >= 1
+
+
+def _make_scene(seed=0, size=(360, 640), sprite_size=(48, 64), location=(400, 200)):
+    random = numpy.random.default_rng(seed)
+
+    frame_data = cv2.GaussianBlur(random.integers(0, 255, size, dtype=numpy.uint8), (7, 7), 0)
+    sprite_data = cv2.GaussianBlur(random.integers(0, 255, sprite_size, dtype=numpy.uint8), (5, 5), 0)
+
+    x, y = location
+    frame_data[y:y + sprite_size[0], x:x + sprite_size[1]] = sprite_data
+
+    return Frame(frame_data), Sprite(f"sprite-{seed}", sprite_data)
+
+
+def test_locate_pyramid_should_find_same_region_as_full_search():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+
+    expected = locator.locate(sprite, frame, threshold=0.9)
+    regions = locator.locate(sprite, frame, threshold=0.9, pyramid=2)
+
+    assert expected == [(400, 200, 64, 48)]
+    assert regions == expected
+
+
+def test_locate_should_only_search_in_sprite_region():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+
+    sprite.metadata["region"] = [380, 180, 120, 100]
+    assert locator.locate(sprite, frame, threshold=0.9) == [(400, 200, 64, 48)]
+    assert locator.locate(sprite, frame, threshold=0.9, use_global_location=False) == [(20, 20, 64, 48)]
+
+    sprite.metadata["region"] = [0, 0, 200, 200]
+    assert locator.locate(sprite, frame, threshold=0.9) == []
+    assert locator.locate(sprite, frame, threshold=0.9, region=None) == [(400, 200, 64, 48)]
+
+
+def test_locate_many_should_keep_sprites_order():
+    locator = SpriteLocator(workers=4)
+    frame, sprite = _make_scene()
+    _, other_sprite = _make_scene(seed=1)
+
+    results = locator.locate_many([sprite, other_sprite, sprite], frame, threshold=0.9)
+
+    assert results == [[(400, 200, 64, 48)], [], [(400, 200, 64, 48)]]
+
+
+def test_locate_should_reuse_result_on_same_frame():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+
+    regions = locator.locate(sprite, frame, threshold=0.9)
+    assert locator.locate(sprite, frame, threshold=0.9, best_match=True) == regions
+    assert locator.match_cache.stats()["hits"] == 1
+
+    locator.locate(sprite, frame, threshold=0.8)
+    assert locator.match_cache.stats()["misses"] == 2
+
+    frame.release()
+    locator.locate(sprite, frame, threshold=0.9)
+    assert locator.match_cache.stats()["misses"] == 3
+
+
+def test_locate_all_should_return_one_region_per_occurrence():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+    frame.image_data[20:68, 30:94] = sprite.image_data
+
+    regions = locator.locate(sprite, frame, threshold=0.5, best_match=False)
+
+    assert sorted(regions) == [(30, 20, 64, 48), (400, 200, 64, 48)]
+
+
+def test_locate_incremental_should_follow_changes_between_frames():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+
+    assert locator.locate(sprite, frame, threshold=0.9, incremental=True) == [(400, 200, 64, 48)]
+
+    # sprite moves, the rest of the screen is unchanged
+    frame_data = frame.image_data.copy()
+    frame_data[200:248, 400:464] = frame_data[0:48, 0:64]
+    frame_data[100:148, 120:184] = sprite.image_data
+    moved_frame = Frame(frame_data)
+
+    assert locator.locate(sprite, moved_frame, threshold=0.9, incremental=True) == [(120, 100, 64, 48)]
+    assert locator.locate(sprite, moved_frame, threshold=0.9) == [(120, 100, 64, 48)]
+
+    # nothing changed, previous matches are reused
+    assert locator.locate(sprite, Frame(frame_data.copy()), threshold=0.9, incremental=True) == [(120, 100, 64, 48)]
+
+
+def test_locate_incremental_should_see_changes_in_partial_edge_tiles():
+    locator = SpriteLocator()
+    frame_data = numpy.full((360, 640), 100, dtype=numpy.uint8)
+    sprite_data = numpy.random.default_rng(0).integers(0, 255, (6, 40), dtype=numpy.uint8)
+    sprite = Sprite("bottom-strip", sprite_data)
+
+    assert locator.locate(sprite, Frame(frame_data.copy()), threshold=0.95, incremental=True) == []
+
+    frame_data[354:360, 100:140] = sprite_data
+
+    assert locator.locate(sprite, Frame(frame_data), threshold=0.95, incremental=True) == [(100, 354, 40, 6)]
+
+
+def test_locate_should_check_anchored_sprite_at_its_anchor_first():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+
+    sprite.metadata["anchor"] = [400, 200]
+    assert locator.locate(sprite, frame, threshold=0.9) == [(400, 200, 64, 48)]
+    assert locator.stats()["counters"]["anchor_hits"] == 1
+
+    # wrong anchor falls back to full search
+    sprite.metadata["anchor"] = [10, 10]
+    assert locator.locate(sprite, frame, threshold=0.9) == [(400, 200, 64, 48)]
+    assert locator.stats()["counters"]["anchor_misses"] == 1
+
+
+def test_locate_should_search_hot_regions_of_priors_first(tmp_path):
+    priors = LocationPriors.load(str(tmp_path / "priors.json"))
+    locator = SpriteLocator(priors=priors)
+    frame, sprite = _make_scene()
+
+    assert locator.locate(sprite, frame, threshold=0.9) == [(400, 200, 64, 48)]
+    assert locator.locate(sprite, Frame(frame.image_data), threshold=0.9) == [(400, 200, 64, 48)]
+
+    stats = priors.stats(sprite.name)
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["regions"] == [(400, 200, 64, 48, 2)]
+
+    priors.save()
+    assert LocationPriors.load(str(tmp_path / "priors.json")).hot_regions(sprite.name) == [(392, 192, 80, 64)]
+
+
+
+def test_priors_should_learn_new_location_when_hot_regions_are_full():
+    priors = LocationPriors(max_regions=4)
+
+    for x in (100, 300, 500, 700):
+        for _ in range(2):
+            priors.record("sprite", (x, 100, 40, 40))
+
+    priors.record("sprite", (900, 500, 40, 40))
+    assert (892, 492, 56, 56) in priors.hot_regions("sprite")
+    assert (92, 92, 56, 56) not in priors.hot_regions("sprite")
+
+    for _ in range(50):
+        priors.record("sprite", (900, 500, 40, 40))
+
+    assert priors.hot_regions("sprite")[0] == (892, 492, 56, 56)
+    assert len(priors.hot_regions("sprite")) == 4
+
+def test_locate_with_feature_engine_should_find_scaled_sprite():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene(sprite_size=(96, 128))
+    scaled_frame = Frame(cv2.resize(frame.image_data, None, fx=0.8, fy=0.8))
+
+    regions = locator.locate(sprite, scaled_frame, engine="feature")
+
+    assert len(regions) == 1
+    x, y, width, height = regions[0]
+    assert abs(x - 320) <= 3 and abs(y - 160) <= 3
+    assert abs(width - 102) <= 4 and abs(height - 77) <= 4
+
+
+def test_locate_with_exact_engine_should_only_find_identical_pixels():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+    frame.image_data[20:68, 30:94] = sprite.image_data
+    frame.image_data[20, 30] ^= 1
+
+    assert locator.locate(sprite, frame, engine="exact", best_match=False) == [(400, 200, 64, 48)]
+    assert locator.locate(sprite, frame, engine="exact", region=(0, 0, 200, 200)) == []
+
+
+def test_locate_with_prefilter_should_skip_sprite_with_missing_colors():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+    color_frame = Frame(cv2.cvtColor(frame.image_data, cv2.COLOR_GRAY2BGR))
+
+    red_sprite = Sprite("red", numpy.zeros((48, 64, 3), dtype=numpy.uint8))
+    red_sprite.image_data[..., 2] = 255
+
+    assert locator.locate(red_sprite, color_frame, threshold=0.9, prefilter=True) == []
+    assert locator.locate(sprite, frame, threshold=0.9, prefilter=True) == [(400, 200, 64, 48)]
+
+    counters = locator.stats()["counters"]
+    assert (counters["prefilter_rejections"], counters["prefilter_passes"]) == (1, 1)
+
+
+def test_template_bank_should_find_best_match_of_each_sprite():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene()
+    sprites = [_make_scene(seed=seed)[1] for seed in range(1, 5)]
+    frame.image_data[20:68, 30:94] = sprites[2].image_data
+
+    results = locator.bank([sprite] + sprites).match(frame, threshold=0.9)
+
+    assert results == {
+        "sprite-0": [(400, 200, 64, 48)],
+        "sprite-1": [],
+        "sprite-2": [],
+        "sprite-3": [(30, 20, 64, 48)],
+        "sprite-4": []
+    }
+
+    results = locator.bank([sprite] + sprites).match(frame, region=(380, 180, 120, 100))
+    assert results["sprite-0"] == [(400, 200, 64, 48)]
+
+
+
+def test_template_bank_should_agree_with_locate_in_odd_region():
+    locator = SpriteLocator()
+    frame, sprite = _make_scene(size=(720, 1280), location=(901, 503))
+    sprites = [sprite] + [_make_scene(seed=seed)[1] for seed in range(1, 4)]
+    region = (853, 461, 201, 151)
+
+    results = locator.bank(sprites).match(frame, region=region, threshold=0.9)
+
+    for other in sprites:
+        assert results[other.name] == locator.locate(other, frame, region=region, threshold=0.9, use_cache=False)
+
+    assert results[sprite.name] == [(901, 503, 64, 48)]
+
+
+def test_prepared_query_should_return_same_locations_as_locate():
+    frame, sprite = _make_scene()
+    other = _make_scene(seed=1)[1]
+
+    locator = SpriteLocator(workers=2)
+    query = locator.prepare([sprite, other], threshold=0.9, im_scale=0.8)
+
+    assert query(frame) == [locator.locate(sprite, frame, threshold=0.9, im_scale=0.8, use_cache=False),
+                            locator.locate(other, frame, threshold=0.9, im_scale=0.8, use_cache=False)]
+    assert query(frame)[0] == [(400, 200, 64, 48)]
+
+    single = locator.prepare(sprite, threshold=0.9, region=(380, 180, 120, 100))
+    assert single(frame) == [(400, 200, 64, 48)]
+
+
+def test_locate_should_find_sprite_rescaled_to_working_scale():
+    frame, sprite = _make_scene()
+    sprite.metadata["region"] = [380, 180, 120, 100]
+
+    scaled_sprite = Sprite.rescale(sprite, 0.5)
+    scaled_frame = Frame(cv2.resize(frame.image_data, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA))
+
+    assert scaled_sprite.region == (190, 90, 60, 50)
+    assert SpriteLocator().locate(scaled_sprite, scaled_frame, threshold=0.9) == [(200, 100, 32, 24)]
+
+
+def test_locate_first_should_try_sprites_with_higher_hit_rate_first():
+    frame, sprite = _make_scene()
+    others = [_make_scene(seed=seed)[1] for seed in range(1, 4)]
+
+    locator = SpriteLocator()
+
+    for _ in range(3):
+        found, locations = locator.locate_first(others + [sprite], frame, threshold=0.9, use_cache=False)
+
+        assert found is sprite
+        assert locations == [(400, 200, 64, 48)]
+
+    first = locator.stats()["first"]
+    assert first["sprite-0"]["attempts"] == 3
+    assert sum(first[other.name]["attempts"] for other in others) < 9
+
+    assert locator.locate_first(others, frame, threshold=0.9) == (None, [])
+
+
+def test_locate_should_try_remembered_scale_first():
+    frame, sprite = _make_scene()
+    large_sprite = Sprite("sprite-large", Image.resize(sprite, width=96).image_data)
+
+    locator = SpriteLocator(scales=ScaleMemory())
+
+    first = locator.locate(large_sprite, frame, threshold=0.8, im_scale=0.5, use_cache=False)
+    assert len(first) == 1
+    assert locator.stats()["counters"].get("scale_hits", 0) == 0
+
+    assert locator.locate(large_sprite, frame, threshold=0.8, im_scale=0.5, use_cache=False) == first
+    assert locator.stats()["counters"]["scale_hits"] == 1
+
+
+def test_locate_with_prefilter_should_find_brightness_shifted_sprite():
+    frame_data = numpy.full((720, 1280), 30, dtype=numpy.uint8)
+    frame_data[500:540, 1000:1120] = 60
+    frame_data[510:530, 1020:1100] = 180
+
+    # captured 8 gray levels brighter than on screen, dominant pixels fall into the next bins
+    sprite = Sprite("button", frame_data[500:540, 1000:1120] + 8)
+    frame = Frame(frame_data)
+
+    locator = SpriteLocator()
+
+    assert locator.locate(sprite, frame, threshold=0.9, use_cache=False) == [(1000, 500, 120, 40)]
+    assert locator.locate(sprite, frame, threshold=0.9, prefilter=True) == [(1000, 500, 120, 40)]
@@ -0,0 +1,57 @@
+import gc
+import threading
+import time
+
+import numpy
+
+from ubot.image import Image
+from ubot.variant_cache import VariantCache
+
+
+def test_variant_cache_should_evict_least_recently_used_over_budget():
+    cache = VariantCache(budget=2500)
+    image = Image(numpy.zeros((10, 10), dtype=numpy.uint8))
+
+    for name in ("a", "b"):
+        cache.get(image, name, lambda: numpy.zeros(1000, dtype=numpy.uint8))
+
+    cache.get(image, "a", lambda: None)
+    cache.get(image, "c", lambda: numpy.zeros(1000, dtype=numpy.uint8))
+
+    stats = cache.stats()
+    assert stats["size"] == 2000
+    assert stats["evictions"] == 1
+    assert isinstance(cache.get(image, "a", lambda: "rebuilt"), numpy.ndarray)
+    assert cache.get(image, "b", lambda: "rebuilt") == "rebuilt"
+
+
+def test_variant_cache_should_build_variant_once_across_threads():
+    cache = VariantCache()
+    image = Image(numpy.zeros((10, 10), dtype=numpy.uint8))
+    calls = []
+
+    def _factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return numpy.ones(10)
+
+    threads = [threading.Thread(target=cache.get, args=(image, "slow", _factory)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_variant_cache_should_drop_variants_of_collected_image():
+    cache = VariantCache()
+    image = Image(numpy.zeros((10, 10), dtype=numpy.uint8))
+    cache.get(image, "data", lambda: numpy.zeros(1000, dtype=numpy.uint8))
+
+    assert cache.stats()["size"] == 1000
+
+    del image
+    gc.collect()
+
+    assert cache.stats() == dict(size=0, budget=cache.budget, entries=0, hits=0, misses=1, evictions=0)
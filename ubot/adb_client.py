@@ -79,6 +79,25 @@ class ADBClient:
             process = subprocess.Popen(cmd, stdout=subprocess.PIPE, shell=True)
             return process.communicate()[0]
 
+    def exec_out_stream(self, command):
+        """
+        Start the command via exec-out, without waiting for it to end
+
+        Parameter
+        ---------
+        command
+            string
+            Command to execute.
+
+        Returns
+        -------
+        subprocess.Popen
+            Process of the command, its binary output in stdout
+        """
+        if self.state == ADBServerState.OPENED:
+            cmd = [_ADB_COMMAND, '-s', self.device.serial, 'exec-out'] + command.split(' ')
+            return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+
     def shell(self, command):
         """
         Executes the command via adb shell
@@ -105,6 +124,25 @@ class ADBClient:
         if self.state == ADBServerState.OPENED:
             return self.device.screencap()
 
+    @property
+    def screencap_raw(self):
+        """
+        Capture emulator screen as raw framebuffer (screencap without -p), skipping the PNG
+        encoding on device
+
+        Returns
+        -------
+        bytearray
+            Header (width, height, format[, colorspace]) followed by pixels, see decode_raw_screencap
+        """
+        if self.state == ADBServerState.OPENED:
+            connection = self.device.create_connection()
+
+            with connection:
+                # exec: has no pty, so the binary output is not mangled by line ending conversion
+                connection.send("exec:screencap")
+                return connection.read_all()
+
     @property
     def screensize(self):
         """
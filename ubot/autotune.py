@@ -0,0 +1,165 @@
+import json
+from os import path, makedirs
+from pathlib import Path
+from statistics import median
+
+import cv2
+
+from ubot.image import Frame
+from ubot.sprite_locator import SpriteLocator, NMS_DISTANCE
+from ubot.coordinates import as_coordinate
+from ubot.settings import SIMILARITY_DEFAULT
+from ubot.benchmark import measure, make_cases
+
+
+TUNING_GRID = dict(
+    im_mode=["grayscale", "threshold"],
+    pyramid=[None, 1, 2]
+)
+
+TUNED_OPTIONS_FILE = "autotune.json"
+
+
+class AutotuneError(BaseException):
+    pass
+
+
+def make_candidates(im_scale=None):
+    """
+    Make candidate configurations: TUNING_GRID, with and without im_scale if provided
+    """
+    grid = dict(TUNING_GRID, im_scale=[None] if im_scale is None else [None, im_scale])
+    return make_cases(grid)
+
+
+def tune_sprite(locator, sprite, frames, candidates, threshold=SIMILARITY_DEFAULT, im_scale=None, repeat=3):
+    """
+    Find the cheapest candidate which finds sprite on every frame where the reference
+    configuration (grayscale, full search at every scale) finds it, and nowhere else.
+
+    Returns:
+        dict(options, latency_ms, reference_latency_ms, found) or None if reference
+        does not find sprite on any frame (nothing to tune against)
+    """
+    reference_options = dict(im_mode="grayscale", pyramid=None, im_scale=im_scale)
+    reference_results, reference_latency = _profile(locator, sprite, frames, reference_options, threshold, repeat)
+
+    if not any(reference_results):
+        return None
+
+    best_options, best_latency = reference_options, reference_latency
+
+    for options in candidates:
+        results, latency = _profile(locator, sprite, frames, options, threshold, repeat)
+
+        if latency < best_latency and _agrees(results, reference_results):
+            best_options, best_latency = options, latency
+
+    return dict(
+        options=best_options,
+        latency_ms=best_latency * 1000,
+        reference_latency_ms=reference_latency * 1000,
+        found=sum(1 for result in reference_results if result)
+    )
+
+
+def run_autotune(package, frames_path, threshold=SIMILARITY_DEFAULT, im_scale=None, repeat=3):
+    """
+    Tune every sprite of package against sample frames, and persist the tuned options
+    (loaded to sprite's metadata "tuned" with the package, see Package)
+
+    Args:
+        package: Package
+        frames_path: string - directory of sample frames (*.png)
+
+    Returns:
+        dict - sprite name -> result of tune_sprite (None if not found on sample frames)
+    """
+    frames = [cv2.imread(str(frame_path)) for frame_path in sorted(Path(frames_path).glob("*.png"))]
+
+    if len(frames) == 0:
+        raise AutotuneError(f"No sample frame found in '{frames_path}'")
+
+    # sample frames are at device resolution, sprites of package at its working scale
+    working_scale = getattr(package, "working_scale", 1.0)
+    if working_scale != 1.0:
+        frames = [cv2.resize(frame, None, fx=working_scale, fy=working_scale, interpolation=cv2.INTER_AREA) for frame in frames]
+
+    frames = [Frame(frame) for frame in frames]
+
+    # no ScaleMemory, remembered scales would turn every im_scale call after the first into a shortcut
+    locator = SpriteLocator(workers=1, scales=None)
+    candidates = make_candidates(im_scale)
+
+    results = {
+        name: tune_sprite(locator, sprite, frames, candidates, threshold=threshold, im_scale=im_scale, repeat=repeat)
+        for name, sprite in sorted(package.sprites.items())
+    }
+
+    save_tuned_options(package.tuned_options_path, {name: result for name, result in results.items() if result is not None})
+
+    return results
+
+
+def save_tuned_options(file_path, tuned):
+    makedirs(path.dirname(file_path), exist_ok=True)
+
+    with open(file_path, "w") as tuned_file:
+        json.dump(tuned, tuned_file, indent=2)
+
+
+def load_tuned_options(file_path):
+    """
+    Returns:
+        dict - sprite name -> tuned options
+    """
+    if not path.isfile(file_path):
+        return dict()
+
+    with open(file_path, "r") as tuned_file:
+        return {name: result["options"] for name, result in json.load(tuned_file).items()}
+
+
+def format_results(results):
+    lines = []
+
+    for name, result in results.items():
+        if result is None:
+            lines.append(f"{name}: not found on sample frames, not tuned")
+            continue
+
+        options = ", ".join(f"{k}={v}" for k, v in result["options"].items())
+        lines.append("{name}: {options} ({latency_ms:.2f}ms, reference {reference_latency_ms:.2f}ms)".format(
+            name=name, options=options, **result))
+
+    return "\n".join(lines)
+
+
+def _profile(locator, sprite, frames, options, threshold, repeat):
+    """
+    Returns:
+        tuple(first found region of each frame, median latency in seconds)
+    """
+    options = dict(options, threshold=threshold, use_cache=False)
+
+    results = []
+    latencies = []
+
+    for frame in frames:
+        regions, frame_latencies = measure(lambda: locator.locate(sprite, frame, **options), repeat=repeat)
+
+        results.append(regions[0] if len(regions) else None)
+        latencies += frame_latencies
+
+    return results, median(latencies)
+
+
+def _agrees(results, reference_results):
+    for result, reference in zip(results, reference_results):
+        if (result is None) != (reference is None):
+            return False
+
+        if result is not None and as_coordinate(result).distance(reference) > NMS_DISTANCE:
+            return False
+
+    return True
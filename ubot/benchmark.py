@@ -0,0 +1,236 @@
+import json
+import itertools
+import platform
+import tracemalloc
+from os import path, cpu_count
+from pathlib import Path
+from time import perf_counter
+
+import numpy
+import cv2
+
+from ubot.image import Frame, Sprite
+from ubot.sprite_locator import SpriteLocator
+
+
+DEFAULT_GRID = dict(
+    im_mode=[None, "grayscale", "threshold"],
+    im_scale=[None, 0.75],
+    threshold=[0.8, 0.9],
+    best_match=[True, False]
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+class BenchmarkError(BaseException):
+    pass
+
+
+def load_corpus(corpus_path):
+    """
+    Load frames and sprites of a recorded corpus
+
+    Layout:
+        <corpus_path>/frames/*.png
+        <corpus_path>/sprites/**/*.png
+        <corpus_path>/cases.json (optional) - list of options dict for SpriteLocator.locate,
+                                              default to grid of DEFAULT_GRID
+
+    Args:
+        corpus_path: string
+
+    Returns:
+        tuple(frames, sprites, cases)
+    """
+    frames_path = Path(path.join(corpus_path, "frames"))
+    sprites_path = Path(path.join(corpus_path, "sprites"))
+
+    frames = [Frame(cv2.imread(str(frame_path))) for frame_path in sorted(frames_path.glob("*.png"))]
+
+    sprites = []
+    for sprite_path in sorted(sprites_path.rglob("*.png")):
+        sprite_name = sprite_path.relative_to(sprites_path).as_posix().lower().replace(".png", "")
+        sprites.append(Sprite.frompath(str(sprite_path), name=sprite_name))
+
+    if len(frames) == 0 or len(sprites) == 0:
+        raise BenchmarkError(f"Corpus '{corpus_path}' needs at least one frame and one sprite")
+
+    cases_path = path.join(corpus_path, "cases.json")
+
+    if path.isfile(cases_path):
+        with open(cases_path, "r") as cases_file:
+            cases = json.load(cases_file)
+    else:
+        cases = make_cases(DEFAULT_GRID)
+
+    return frames, sprites, cases
+
+
+def make_cases(grid):
+    """
+    Make every combination of options in grid (dict of option -> list of values)
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def measure(func, repeat=1):
+    """
+    Call func repeat times
+
+    Returns:
+        tuple(last result, list of latencies in seconds)
+    """
+    latencies = []
+    result = None
+
+    for _ in range(repeat):
+        started_at = perf_counter()
+        result = func()
+        latencies.append(perf_counter() - started_at)
+
+    return result, latencies
+
+
+def summarize(latencies):
+    """
+    Summarize latencies (seconds) to milliseconds percentiles, mean and throughput
+    """
+    latencies = numpy.asarray(latencies)
+    total = float(latencies.sum())
+
+    summary = {f"p{p}_ms": float(numpy.percentile(latencies, p) * 1000) for p in PERCENTILES}
+    summary["mean_ms"] = float(latencies.mean() * 1000)
+    summary["throughput"] = len(latencies) / total if total > 0 else 0.0
+
+    return summary
+
+
+def run_case(locator, frames, sprites, options, repeat=3):
+    """
+    Benchmark SpriteLocator.locate with options over every frame and sprite
+
+    Returns:
+        dict - options, calls, found, latency summary and peak_memory_kb
+    """
+    # result memoization would turn repeated calls into cache hits
+    options = dict(options, use_cache=False)
+
+    latencies = []
+    found = 0
+    errors = 0
+
+    for frame, sprite in itertools.product(frames, sprites):
+        try:
+            regions, sprite_latencies = measure(lambda: locator.locate(sprite, frame, **options), repeat=repeat)
+        except cv2.error:
+            errors += 1
+            continue
+
+        latencies += sprite_latencies
+        found += int(len(regions) > 0)
+
+    # memory is measured in a separate pass, tracing slows allocations down
+    tracemalloc.start()
+    try:
+        for frame, sprite in itertools.product(frames, sprites):
+            try:
+                locator.locate(sprite, Frame(frame.image_data), **options)
+            except cv2.error:
+                pass
+
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = dict(
+        options={k: v for k, v in options.items() if k != "use_cache"},
+        calls=len(latencies),
+        found=found,
+        errors=errors,
+        peak_memory_kb=peak_memory / 1024
+    )
+
+    if len(latencies):
+        result.update(summarize(latencies))
+
+    return result
+
+
+def run_benchmark(corpus_path, repeat=3, locator=None):
+    """
+    Benchmark SpriteLocator over a recorded corpus (see load_corpus)
+
+    Returns:
+        dict - machine readable results
+    """
+    frames, sprites, cases = load_corpus(corpus_path)
+    # no ScaleMemory, remembered scales would turn every im_scale call after the first into a shortcut
+    locator = locator or SpriteLocator(workers=1, scales=None)
+
+    return dict(
+        corpus=str(corpus_path),
+        environment=dict(
+            python=platform.python_version(),
+            opencv=cv2.__version__,
+            numpy=numpy.__version__,
+            cpu_count=cpu_count()
+        ),
+        frames=len(frames),
+        sprites=len(sprites),
+        repeat=repeat,
+        cases=[run_case(locator, frames, sprites, options, repeat=repeat) for options in cases]
+    )
+
+
+def compare_results(baseline, results):
+    """
+    Compare p50 latency of each case with a baseline run
+
+    Returns:
+        array of dict(options, baseline_p50_ms, p50_ms, speedup)
+    """
+    baseline_cases = {json.dumps(case["options"], sort_keys=True): case for case in baseline["cases"]}
+
+    comparison = []
+
+    for case in results["cases"]:
+        baseline_case = baseline_cases.get(json.dumps(case["options"], sort_keys=True), None)
+
+        if baseline_case is None or "p50_ms" not in baseline_case or "p50_ms" not in case:
+            continue
+
+        comparison.append(dict(
+            options=case["options"],
+            baseline_p50_ms=baseline_case["p50_ms"],
+            p50_ms=case["p50_ms"],
+            speedup=baseline_case["p50_ms"] / case["p50_ms"] if case["p50_ms"] > 0 else 0.0
+        ))
+
+    return comparison
+
+
+def format_results(results, comparison=None):
+    lines = [f"{results['frames']} frame(s) x {results['sprites']} sprite(s), repeat {results['repeat']}", ""]
+
+    speedups = {json.dumps(c["options"], sort_keys=True): c["speedup"] for c in comparison or []}
+
+    for case in results["cases"]:
+        options = ", ".join(f"{k}={v}" for k, v in case["options"].items()) or "default"
+
+        if "p50_ms" not in case:
+            lines.append(f"{options}: no successful call ({case['errors']} error(s))")
+            continue
+
+        line = "{name}: p50 {p50_ms:.2f}ms, p90 {p90_ms:.2f}ms, p99 {p99_ms:.2f}ms, {throughput:.1f} calls/s, " \
+               "peak {peak_memory_kb:.0f}KB, found {found}/{total}".format(
+                   name=options, total=case["calls"] // results["repeat"], **case)
+
+        speedup = speedups.get(json.dumps(case["options"], sort_keys=True), None)
+        if speedup is not None:
+            line += f", x{speedup:.2f} vs baseline"
+
+        lines.append(line)
+
+    return "\n".join(lines)
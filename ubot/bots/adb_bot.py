@@ -1,11 +1,14 @@
+from os import path
+
 from ubot.bots.bot import Bot, ACTIVE_MODE, PASSIVE_MODE
 from ubot.settings import SIMILARITY_DEFAULT
 
 from ubot.adb_client import ADBClient
 from ubot.adb_input_controller import ADBInputController
 
-from ubot.package_loader import Package
-from ubot.frame_grabbers import ADBFrameGrabber
+from ubot.package_loader import Package, LEARNED_DATA_DIR
+from ubot.scale_memory import ScaleMemory
+from ubot import frame_grabbers
 
 
 class ADBBotError(BaseException):
@@ -15,12 +18,11 @@ class ADBBotError(BaseException):
 class ADBBot(Bot):
 
     def __init__(self, config, package, **kwargs):
-        super().__init__(config, **kwargs)
-
         if not isinstance(package, Package):
             raise ValueError("package must be provided")
 
-        self.pkg = package
+        super().__init__(config, package=package, **kwargs)
+
         self.adb_client = ADBClient()
         self.input_controller = ADBInputController(self.adb_client)
 
@@ -28,12 +30,18 @@ class ADBBot(Bot):
         self.adb_client.start_server()
 
         width, height = self.adb_client.screensize
-        self.frame_grabber = ADBFrameGrabber(self.adb_client, self.config, width, height)
+        self.frame_grabber = frame_grabbers.make(self.adb_client, self.config, width, height)
+
+        # scales matched by sprites only hold for this device
+        scales_filename = ScaleMemory.device_filename(getattr(self.adb_client.device, "serial", None))
+        self.sprite_locator.scales = ScaleMemory.load(path.join(self.pkg.package_path, LEARNED_DATA_DIR, scales_filename))
 
         return self
 
     def __exit__(self, *args, **kwargs):
         self.adb_client.stop_server()
+        self.pkg.priors.save()
+        self.sprite_locator.scales.save()
 
     def tap(self, sprite_or_coord, then_wait=0.7, threshold=SIMILARITY_DEFAULT, **kwargs):
 
@@ -65,3 +73,4 @@ class ADBBot(Bot):
 
     def text(self):
         pass
+
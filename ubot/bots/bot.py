@@ -4,11 +4,13 @@ import inspect
 
 from ubot import logger
 from ubot.frame_buffer import FrameBuffer
+from ubot.variant_cache import VariantCache
 from ubot.frame_limiter import FrameLimiter
 
 from ubot.taskmanager import TaskManager
 from ubot.settings import SIMILARITY_DEFAULT
 from ubot.sprite_locator import SpriteLocator
+from ubot.scale_memory import ScaleMemory
 from ubot.ocr import detect_numbers
 
 
@@ -22,8 +24,9 @@ class BotError(BaseException):
 
 class Bot:
 
-    def __init__(self, config, **kwargs):
+    def __init__(self, config, package=None, **kwargs):
         self.config = config
+        self.pkg = package
 
         self.run_flags = dict()
 
@@ -35,7 +38,15 @@ class Bot:
         self.frame_buffer = None
         self._setup_frame_buffer()
 
-        self.sprite_locator = SpriteLocator()
+        # vision runs at this scale of device resolution, scripts only see device coordinates
+        self.working_scale = getattr(package, "working_scale", 1.0) if package is not None else 1.0
+
+        self.sprite_locator = SpriteLocator(
+            workers=config["SpriteLocator"]["Workers"],
+            priors=package.priors if package is not None else None,
+            scales=ScaleMemory(),
+            default_options=dict(im_mode="grayscale")
+        )
 
     def retrieve_latest_frame(self):
         if self.run_flags.get("in_frame_loop", False):
@@ -67,7 +78,8 @@ class Bot:
             sprite_names = [sprite_name_or_list]
 
         sprites = [self.pkg.sprites[sprite_name] for sprite_name in sprite_names]
-        results = [self._locate_sprite(sprite, frame, threshold=threshold, **options) for sprite in sprites]
+        results = self._locate_sprites(sprites, frame, threshold=threshold, **self._to_frame_options(options))
+        results = [self._to_device_locations(locations) for locations in results]
 
         if len(sprite_names) == 1:
             return results[0]
@@ -77,6 +89,97 @@ class Bot:
 
         return results
 
+    def first_seen(self, sprite_name_list, frame=None, threshold=SIMILARITY_DEFAULT, **options):
+        """
+        Find the first of sprites seen on frame, without matching the rest.
+        Sprites are tried by their hit rate and cost so far (see SpriteLocator.locate_first).
+
+        Example:
+            screen, _ = bot.first_seen(["screens/home", "screens/battle", "screens/shop"])
+
+        Return:
+            tuple(sprite name, locations) or (None, []) if none is seen
+        """
+        if frame is None:
+            frame = self.retrieve_latest_frame()
+
+        sprites = [self.pkg.sprites[sprite_name] for sprite_name in sprite_name_list]
+        sprite, locations = self.sprite_locator.locate_first(sprites, frame, threshold=threshold,
+                                                             **self._to_frame_options(options))
+
+        return (sprite.name if sprite is not None else None), self._to_device_locations(locations)
+
+    def seen_any(self, sprite_name_list, frame=None, threshold=SIMILARITY_DEFAULT, **options):
+        """
+        Check if any of sprites is seen on frame, stopping at the first one found
+        """
+        sprite_name, _ = self.first_seen(sprite_name_list, frame=frame, threshold=threshold, **options)
+        return sprite_name is not None
+
+    def prepare(self, sprite_name_or_list, threshold=SIMILARITY_DEFAULT, return_dict=False, **options):
+        """
+        Compile a `seen` query once, to be called with frames in hot frame handler loops.
+        Sprite names, options and templates are resolved here instead of on every call.
+
+        Example:
+            buttons_seen = bot.prepare(["menu/battle", "menu/home"], region=(0, 600, 1280, 120))
+
+            def _frame_handler(frame):
+                battle, home = buttons_seen(frame)
+
+        Return:
+            function(frame) -> same result as `seen`
+        """
+        if isinstance(sprite_name_or_list, (list, tuple)):
+            sprite_names = sprite_name_or_list
+        else:
+            sprite_names = [sprite_name_or_list]
+
+        sprites = [self.pkg.sprites[sprite_name] for sprite_name in sprite_names]
+        query = self.sprite_locator.prepare(sprites, threshold=threshold, **self._to_frame_options(options))
+
+        def _seen(frame=None):
+            if frame is None:
+                frame = self.retrieve_latest_frame()
+
+            results = [self._to_device_locations(locations) for locations in query(frame)]
+
+            if len(sprite_names) == 1:
+                return results[0]
+
+            if return_dict:
+                return dict(zip(sprite_names, results))
+
+            return results
+
+        return _seen
+
+    def bank(self, sprite_name_list, **options):
+        """
+        Make a template bank of same-size sprites, to check them all against a frame in one shared pass.
+        Like `seen`, regions are in device coordinates whatever the working scale.
+
+        Example:
+            icons_seen = bot.bank(["items/potion", "items/ether", "items/elixir"])
+            found = icons_seen(threshold=0.9, region=(0, 600, 1280, 120))
+
+        Return:
+            function(frame=None, region=None, threshold=SIMILARITY_DEFAULT) -> dict of sprite name -> locations
+        """
+        sprites = [self.pkg.sprites[sprite_name] for sprite_name in sprite_name_list]
+        bank = self.sprite_locator.bank(sprites, **options)
+
+        def _match(frame=None, region=None, threshold=SIMILARITY_DEFAULT):
+            if frame is None:
+                frame = self.retrieve_latest_frame()
+
+            region = self._to_frame_options(dict(region=region))["region"]
+            results = bank.match(frame, region=region, threshold=threshold)
+
+            return dict(zip(sprite_name_list, (self._to_device_locations(results[sprite.name]) for sprite in sprites)))
+
+        return _match
+
     def wait(self, duration=None, flex=None, **kwargs):
         """
         Method for putting the program to sleep for a random amount of time.
@@ -238,13 +341,42 @@ class Bot:
         fonts = [self.pkg.sprites[sprite_name].grayscale for sprite_name in sprite_name_list]
         return detect_numbers(image.grayscale, fonts, max_digits)
 
-    def _locate_sprite(self, sprite, frame, im_mode="grayscale", **options):
-        return self.sprite_locator.locate(sprite, frame, im_mode=im_mode, **options)
+    def _to_frame_options(self, options):
+        """
+        Scale location options (region, anchor) given in device coordinates to frames' working scale
+        """
+        if self.working_scale == 1.0:
+            return options
+
+        options = dict(options)
+
+        for key in ("region", "anchor"):
+            if options.get(key, None) is not None:
+                options[key] = tuple(int(round(value * self.working_scale)) for value in options[key])
+
+        return options
+
+    def _to_device_locations(self, locations):
+        """
+        Scale locations found on frames (working scale) back to device coordinates
+        """
+        if self.working_scale == 1.0:
+            return locations
+
+        return [tuple(int(round(value / self.working_scale)) for value in location) for location in locations]
+
+    def _locate_sprite(self, sprite, frame, **options):
+        return self.sprite_locator.locate(sprite, frame, **options)
+
+    def _locate_sprites(self, sprites, frame, **options):
+        return self.sprite_locator.locate_many(sprites, frame, **options)
 
     def _setup_frame_buffer(self):
         FrameBuffer.setup(self.config)
         self.frame_buffer = FrameBuffer.get_instance()
 
+        VariantCache.setup(self.config)
+
 
 def _find_step(steps, value):
     if value is None:
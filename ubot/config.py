@@ -52,6 +52,18 @@ def _load_config(config_path):
         "FrameBuffer": {
             "Size": INTEGER
         },
+        "FrameGrabber": {
+            "CaptureMode": STRING,
+            "DumpFiles": INTEGER,
+            "DecodeWorkers": INTEGER
+        },
+        "SpriteLocator": {
+            "Workers": INTEGER,
+            "WorkingScale": REAL
+        },
+        "VariantCache": {
+            "Budget": INTEGER
+        },
         "Updates": {
             "Enabled": BOOLEAN,
             "Channel": STRING
@@ -69,6 +81,18 @@ def _load_config(config_path):
         "FrameBuffer": {
             "Size": 5
         },
+        "FrameGrabber": {
+            "CaptureMode": "png",  # png, raw (framebuffer without PNG encoding), stream (screenrecord)
+            "DumpFiles": 3,  # dump files reused in rotation with Emulator.SharedFolders
+            "DecodeWorkers": 2
+        },
+        "SpriteLocator": {
+            "Workers": None,
+            "WorkingScale": 1.0
+        },
+        "VariantCache": {
+            "Budget": 256  # megabytes
+        },
         "Updates": {
             "Enabled": True,
             "Channel": "Release"
@@ -1,4 +1,6 @@
 import math
+
+import numpy
 from scipy import spatial
 
 
@@ -312,3 +314,37 @@ def filter_similar_coords(coords, distance):
         results.append(mcoord)
 
     return results
+
+
+def non_max_suppression(coords, scores, distance):
+    """
+    Keeps only the coordinate with the highest score of each group of coordinates
+    that are close to each other. Runs in O(n log n) using a single KD-tree.
+
+    Args:
+        coords (array): An array containing the coordinates to be filtered.
+        scores (array): Score of each coordinate.
+        distance (int): Coordinates closer than this distance are suppressed by the stronger one.
+
+    Returns:
+        array: An array containing the kept coordinates, strongest first.
+    """
+    if len(coords) == 0:
+        return []
+
+    points = numpy.asarray([coord[:2] for coord in coords], dtype=numpy.float32)
+    order = numpy.argsort(-numpy.asarray(scores), kind="stable")
+
+    tree = spatial.cKDTree(points)
+    suppressed = numpy.zeros(len(coords), dtype=bool)
+
+    results = []
+
+    for index in order:
+        if suppressed[index]:
+            continue
+
+        results.append(coords[index])
+        suppressed[tree.query_ball_point(points[index], distance)] = True
+
+    return results
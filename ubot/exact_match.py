@@ -0,0 +1,89 @@
+import numpy
+import cv2
+
+
+def frame_histogram(image):
+    """
+    Histogram of the first channel of image, cached in image's variants
+    """
+    data = image.image_data if image.image_data.ndim == 2 else image.image_data[..., 0]
+    return image.variant("histogram", lambda: numpy.bincount(data.ravel(), minlength=256))
+
+
+def frame_integral(image):
+    """
+    Integral images (sum, squared sum) of image, cached in image's variants
+    """
+    return image.variant("integral", lambda: cv2.integral2(image.image_data, sdepth=cv2.CV_64F))
+
+
+def match_exact(template, frame, region=None):
+    """
+    Find pixel-identical occurrences of template on frame, much cheaper than correlation:
+
+        1. seed: compare the template pixel whose value is the rarest on frame with every location
+        2. filter seeds by sum and squared sum of the window (integral images of frame)
+        3. confirm the remaining candidates pixel by pixel
+
+    Parameter
+    ---------
+    template:
+        Image (uint8)
+
+    frame:
+        Image (uint8), same number of channels as template
+
+    region:
+        tuple(x, y, width, height) - optional
+        Only search inside this region of the frame.
+
+    Returns
+    -------
+    array
+        Array of tuple(region, score), score is always 1.0
+    """
+    template_data = template.image_data
+    frame_data = frame.image_data
+
+    height, width = template_data.shape[:2]
+    region_x, region_y, region_width, region_height = region or (0, 0, frame_data.shape[1], frame_data.shape[0])
+
+    if region_width < width or region_height < height:
+        return []
+
+    # 1. seed
+    first_channel = template_data if template_data.ndim == 2 else template_data[..., 0]
+    seed_y, seed_x = numpy.unravel_index(numpy.argmin(frame_histogram(frame)[first_channel]), first_channel.shape)
+
+    seeds = frame_data[region_y + seed_y:region_y + seed_y + region_height - height + 1,
+                       region_x + seed_x:region_x + seed_x + region_width - width + 1]
+
+    mask = seeds == template_data[seed_y, seed_x]
+    if mask.ndim == 3:
+        mask = mask.all(axis=2)
+
+    # flatnonzero is about 10x faster than nonzero on a 2D mask
+    ys, xs = numpy.divmod(numpy.flatnonzero(mask), mask.shape[1])
+    ys += region_y
+    xs += region_x
+
+    # 2. window sums
+    integral, sq_integral = frame_integral(frame)
+
+    def _window_sums(table):
+        return table[ys + height, xs + width] - table[ys, xs + width] - table[ys + height, xs] + table[ys, xs]
+
+    channels = 1 if template_data.ndim == 2 else template_data.shape[2]
+    pixels = template_data.reshape(-1, channels).astype(numpy.float64)
+
+    keep = numpy.all((_window_sums(integral).reshape(-1, channels) == pixels.sum(axis=0)) &
+                     (_window_sums(sq_integral).reshape(-1, channels) == (pixels ** 2).sum(axis=0)), axis=1)
+
+    # 3. confirm
+    matches = []
+
+    for x, y in zip(xs[keep], ys[keep]):
+        if numpy.array_equal(frame_data[y:y + height, x:x + width], template_data):
+            matches.append(((int(x), int(y), width, height), 1.0))
+
+    return matches
@@ -0,0 +1,97 @@
+import numpy
+import cv2
+
+
+ORB_PATCH_SIZE = 15
+SPRITE_FEATURES = 500
+FRAME_FEATURES = 5000
+
+FEATURE_MIN_MATCHES = 8
+FEATURE_RATIO = 0.75
+
+
+def compute_features(image, n_features):
+    """
+    Compute ORB keypoints and descriptors of image (grayscale), cached in image's variants,
+    so descriptors of a frame are computed once and shared by every sprite located on it.
+
+    Returns
+    -------
+    tuple(keypoints, descriptors)
+        descriptors is None if no keypoint was found
+    """
+
+    def _compute():
+        orb = cv2.ORB_create(nfeatures=n_features, edgeThreshold=ORB_PATCH_SIZE, patchSize=ORB_PATCH_SIZE)
+        return orb.detectAndCompute(image.grayscale.image_data, None)
+
+    return image.variant(f"orb-{n_features}", _compute)
+
+
+def match_features(sprite, frame, region=None, min_matches=FEATURE_MIN_MATCHES, ratio=FEATURE_RATIO):
+    """
+    Locate sprite on frame by matching keypoints. Sprite may be scaled or rotated on frame.
+
+    Parameter
+    ---------
+    sprite:
+        Image
+
+    frame:
+        Image
+
+    region:
+        tuple(x, y, width, height) - optional
+        Only use frame keypoints inside this region.
+
+    min_matches:
+        int
+        Minimum number of consistent keypoint matches to accept a location.
+
+    ratio:
+        float
+        Lowe's ratio test, best match must be this much closer than the second best.
+
+    Returns
+    -------
+    array
+        Array of tuple(region, score) (at most one), score is the ratio of consistent matches
+    """
+    keypoints, descriptors = compute_features(sprite, SPRITE_FEATURES)
+    frame_keypoints, frame_descriptors = compute_features(frame, FRAME_FEATURES)
+
+    if descriptors is None or frame_descriptors is None or len(frame_keypoints) < 2:
+        return []
+
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    pairs = matcher.knnMatch(descriptors, frame_descriptors, k=2)
+
+    good = [pair[0] for pair in pairs if len(pair) == 2 and pair[0].distance < ratio * pair[1].distance]
+
+    if region is not None:
+        x, y, width, height = region
+        good = [m for m in good
+                if x <= frame_keypoints[m.trainIdx].pt[0] < x + width and y <= frame_keypoints[m.trainIdx].pt[1] < y + height]
+
+    if len(good) < min_matches:
+        return []
+
+    src_points = numpy.float32([keypoints[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+    dst_points = numpy.float32([frame_keypoints[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+
+    # rotation, uniform scale and translation: enough for DPI/resolution changes
+    transform, inliers = cv2.estimateAffinePartial2D(src_points, dst_points, method=cv2.RANSAC, ransacReprojThreshold=3)
+
+    if transform is None or int(inliers.sum()) < min_matches:
+        return []
+
+    sprite_width, sprite_height = sprite.shape[:2]
+    corners = numpy.float32([[0, 0], [sprite_width, 0], [0, sprite_height], [sprite_width, sprite_height]]).reshape(-1, 1, 2)
+    corners = cv2.transform(corners, transform)
+
+    frame_width, frame_height = frame.shape[:2]
+    x, y, width, height = cv2.boundingRect(corners)
+    x, y = max(x, 0), max(y, 0)
+    width, height = min(width, frame_width - x), min(height, frame_height - y)
+
+    return [((int(x), int(y), int(width), int(height)), int(inliers.sum()) / len(good))]
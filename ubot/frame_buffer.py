@@ -26,7 +26,12 @@ class FrameBuffer:
         return self.frames[0] if len(self.frames) else None
 
     def add_frame(self, frame):
+        # a grabber may return the same frame again while the screen does not change
+        if any(buffered_frame is frame for buffered_frame in self.frames):
+            return
+
         if self.full:
+            self.frames[-1].release()
             self.frames = [frame] + self.frames[:-1]
         else:
             self.frames = [frame] + self.frames
@@ -1 +1,15 @@
 from ubot.frame_grabbers.adb_frame_grabber import ADBFrameGrabber
+from ubot.frame_grabbers.adb_stream_frame_grabber import ADBStreamFrameGrabber
+
+
+CAPTURE_STREAM = "stream"
+
+
+def make(adb_client, config, width, height):
+    """
+    Make frame grabber of capture mode in config (FrameGrabber.CaptureMode)
+    """
+    if config["FrameGrabber"]["CaptureMode"] == CAPTURE_STREAM:
+        return ADBStreamFrameGrabber(adb_client, config, width, height)
+
+    return ADBFrameGrabber(adb_client, config, width, height)
@@ -1,18 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 from time import time, sleep
+from queue import Queue
 
+import itertools
+import mmap
 import posixpath
 from os import path
 
 import numpy
 import cv2
 
+from ubot import logger
 from ubot.taskmanager import TaskManager
 from ubot.image import Frame
 from ubot.frame_buffer import FrameBuffer
 from ubot.frame_limiter import FrameLimiter
 
 
+CAPTURE_PNG = "png"
+CAPTURE_RAW = "raw"
+
+# screencap written to a dump file of shared folder (Emulator.SharedFolders)
+CAPTURE_DUMP = "dump"
+
+# captures waiting to be decoded and handed off, more are dropped
+PIPELINE_DEPTH = 4
+
+# dump files in flight: one queued decode, one decode held by the hand-off and the capture being written
+MIN_DUMP_FILES = 3
+
+# android PixelFormat -> bytes per pixel, conversion of pixels to grayscale, conversion of pixels to BGR
+RAW_FORMATS = {
+    1: (4, cv2.COLOR_RGBA2GRAY, cv2.COLOR_RGBA2BGR), # RGBA_8888
+    2: (4, cv2.COLOR_RGBA2GRAY, cv2.COLOR_RGBA2BGR), # RGBX_8888
+    3: (3, cv2.COLOR_RGB2GRAY, cv2.COLOR_RGB2BGR), # RGB_888
+    4: (2, cv2.COLOR_BGR5652GRAY, cv2.COLOR_BGR5652BGR) # RGB_565
+}
+
+
 class ADBFrameGrabberError(BaseException):
     pass
 
@@ -33,24 +59,77 @@ class ADBFrameGrabber:
         self.is_running = False
 
         self.shared_dirs = config["Emulator"]["SharedFolders"]
+        self.capture_mode = config["FrameGrabber"]["CaptureMode"]
 
-    def start(self):
+        if self.capture_mode not in [CAPTURE_PNG, CAPTURE_RAW]:
+            raise ADBFrameGrabberError(f"Invalid capture mode '{self.capture_mode}'")
+
+        # shared folder dump files reused in rotation, so a dump is not overwritten while being read
+        self.dump_files = config["FrameGrabber"]["DumpFiles"] or MIN_DUMP_FILES
+
+        if self.shared_dirs is not None and self.dump_files < MIN_DUMP_FILES:
+            logger.warning(f"DumpFiles must be at least {MIN_DUMP_FILES}, using {MIN_DUMP_FILES} dump files")
+            self.dump_files = MIN_DUMP_FILES
+        self._dump_index = itertools.count()
 
+        # frames are downscaled once here, vision runs at this scale (see Bot._to_device_locations)
+        self.working_scale = config["SpriteLocator"]["WorkingScale"] or 1.0
+
+        self.decode_workers = max(config["FrameGrabber"]["DecodeWorkers"] or 1, 1)
+        self.dropped_frames = 0
+
+    def start(self):
+        """
+        Grab frames into FrameBuffer continuously, as a pipeline: a capture thread (ADB round-trip),
+        a pool of decode workers (decoding, color conversion, scaling) and a hand-off thread adding
+        frames to FrameBuffer in capture order. Captures are dropped while the decode queue is full.
+        """
         if self.is_running:
             return
 
-        def _worker(task):
+        # decodes in flight must not read a dump file the capture is overwriting
+        depth = PIPELINE_DEPTH if self.shared_dirs is None else min(PIPELINE_DEPTH, self.dump_files - 2)
+
+        pending = Queue(maxsize=depth)
+        decoders = ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="frame-grabber-decoder")
+
+        def _capture_worker(task):
             while task.alive:
                 self.frame_limiter.start()
 
-                frame = self.grab_frame()
-                self.frame_buffer.add_frame(frame)
+                try:
+                    if pending.full():
+                        self.dropped_frames += 1
+                    else:
+                        pending.put(decoders.submit(self._decode, self._capture()))
+
+                # a failed ADB round-trip (device busy, dump not written...) must not end the pipeline
+                except Exception as ex:
+                    logger.error(f"Failed to capture frame: {ex}")
 
                 self.frame_limiter.stop_and_delay()
 
-        worker = TaskManager.create_task("frame-grabber-worker", target=_worker)
+            pending.put(None)
+
+        def _hand_off_worker(task):
+            while True:
+                decoding = pending.get()
+
+                if decoding is None:
+                    break
+
+                try:
+                    frame_data = decoding.result()
+                except Exception as ex:
+                    logger.error(f"Failed to decode frame: {ex}")
+                    continue
 
-        worker.start()
+                self.frame_buffer.add_frame(Frame(frame_data, previous_frame=self.frame_buffer.previous_frame))
+
+            decoders.shutdown()
+
+        TaskManager.create_task("frame-grabber-worker", target=_capture_worker).start()
+        TaskManager.create_task("frame-grabber-hand-off", target=_hand_off_worker).start()
 
         self.is_running = True
 
@@ -58,33 +137,100 @@ class ADBFrameGrabber:
         if self.is_running:
             self.is_running = False
             TaskManager.stop_task("frame-grabber-worker", join=True)
+            TaskManager.stop_task("frame-grabber-hand-off", join=True)
 
     def grab_frame(self):
-        frame_data = None
+        frame_data = self._decode(self._capture())
+
+        previous_frame = self.frame_buffer.previous_frame
+        return Frame(frame_data, previous_frame=previous_frame)
+
+    def _capture(self):
+        """
+        Capture stage: get screen from device, as undecoded payload
+
+        Returns:
+            tuple(capture mode, payload)
+        """
+        if self.shared_dirs is None and self.capture_mode == CAPTURE_RAW:
+            return CAPTURE_RAW, self.adb_client.screencap_raw
 
         if self.shared_dirs is None:
-            frame_data = cv2.imdecode(
-                numpy.asarray(self.adb_client.screencap, dtype=numpy.uint8),
-                0
-            )
+            return CAPTURE_PNG, self.adb_client.screencap
+
+        # dump files are reused in rotation (overwritten by screencap), no rm round-trip
+        dev_path, pc_path = self.shared_dirs
+        screen_filename = f"screen-{next(self._dump_index) % self.dump_files}.dump"
+
+        self.adb_client.shell(f"screencap {posixpath.join(dev_path, screen_filename)}")
+
+        return CAPTURE_DUMP, path.join(pc_path, screen_filename)
+
+    def _decode(self, capture):
+        """
+        Decode stage: decode payload of capture, convert and scale it to frame data
+        """
+        capture_mode, payload = capture
+
+        if capture_mode == CAPTURE_RAW:
+            pixels, pixel_format = decode_raw_screencap(payload)
+            frame_data = cv2.cvtColor(pixels, RAW_FORMATS[pixel_format][1])
+
+        elif capture_mode == CAPTURE_PNG:
+            # decoded in color and converted like sprites (Image.grayscale), libpng's own grayscale
+            # conversion differs on many pixels so exactly identical sprites would not match
+            frame_data = cv2.imdecode(numpy.frombuffer(payload, dtype=numpy.uint8), cv2.IMREAD_COLOR)
+            frame_data = cv2.cvtColor(frame_data, cv2.COLOR_BGR2GRAY)
+
         else:
-            dev_path, pc_path = self.shared_dirs
-            current_time = time()
-            screen_filename = "screen-{0:.2f}.dump".format(current_time - self.created_time)
-            dev_path = posixpath.join(dev_path, screen_filename)
-            pc_path = path.join(pc_path, screen_filename)
+            frame_data = _read_dump(payload)
 
-            try:
-                self.adb_client.shell(f"screencap {dev_path}")
-                with open(pc_path, "rb") as file_dump:
-                    buffer = file_dump.read()[12:]
-                    header = (self.screen_height, self.screen_width, 4)
+        if self.working_scale != 1.0:
+            frame_data = cv2.resize(frame_data, None, fx=self.working_scale, fy=self.working_scale,
+                                    interpolation=cv2.INTER_AREA)
 
-                    frame_data = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(header)
-                    frame_data = cv2.cvtColor(frame_data, cv2.COLOR_RGBA2BGR)
+        return frame_data
 
-            finally:
-                self.adb_client.shell(f"rm {dev_path}")
 
-        previous_frame = self.frame_buffer.previous_frame
-        return Frame(frame_data, previous_frame=previous_frame)
+def _read_dump(dump_path):
+    """
+    Read frame from raw screencap dump, memory-mapped so pixels are converted straight from the file
+    """
+    with open(dump_path, "rb") as dump_file:
+        with mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ) as dump:
+            pixels, pixel_format = decode_raw_screencap(dump)
+            frame_data = cv2.cvtColor(pixels, RAW_FORMATS[pixel_format][2])
+
+            # views of the map must be released before it is closed
+            del pixels
+
+    return frame_data
+
+
+def decode_raw_screencap(buffer):
+    """
+    Parse raw screencap output: little-endian uint32 width, height, pixel format and, since
+    Android 9, color space, followed by the pixels.
+
+    Args:
+        buffer: bytes, bytearray or mmap
+
+    Return:
+        tuple(numpy.ndarray, int) - pixels of shape (height, width, bytes per pixel), a view of
+            buffer (no copy), and android PixelFormat of pixels
+    """
+    width, height, pixel_format = numpy.frombuffer(buffer, dtype="<u4", count=3)
+
+    if pixel_format not in RAW_FORMATS:
+        raise ADBFrameGrabberError(f"Unsupported screencap pixel format {pixel_format}")
+
+    bytes_per_pixel = RAW_FORMATS[pixel_format][0]
+    pixels_size = int(width) * int(height) * bytes_per_pixel
+    header_size = len(buffer) - pixels_size
+
+    if header_size not in (12, 16):
+        raise ADBFrameGrabberError(f"Unexpected screencap size {len(buffer)} for {width}x{height}")
+
+    pixels = numpy.frombuffer(buffer, dtype=numpy.uint8, count=pixels_size, offset=header_size)
+
+    return pixels.reshape(int(height), int(width), bytes_per_pixel), int(pixel_format)
@@ -0,0 +1,176 @@
+import subprocess
+import threading
+from time import sleep
+
+import numpy
+
+from ubot import logger
+from ubot.taskmanager import TaskManager
+from ubot.image import Frame
+from ubot.frame_buffer import FrameBuffer
+
+
+# screenrecord stops by itself after its time limit (180 seconds at most), the stream is then restarted
+SCREENRECORD_TIME_LIMIT = 180
+
+# bit rate of the stream, high enough for UI to stay sharp
+SCREENRECORD_BIT_RATE = 8000000
+
+RECONNECT_DELAY = 0.5
+
+_FFMPEG_COMMAND = "ffmpeg"
+
+
+class ADBStreamFrameGrabberError(BaseException):
+    pass
+
+
+class ADBStreamFrameGrabber:
+    """
+    Grab frames from one long-lived `screenrecord` H.264 stream over ADB, decoded by ffmpeg
+    (must be in PATH) to grayscale frames, instead of a screencap round-trip per frame.
+    The stream is restarted whenever the device ends the recording.
+
+    screenrecord only sends a frame when the screen changes, so the latest frame is kept until
+    the next one arrives.
+    """
+
+    def __init__(self, adb_client, config, width=1280, height=720, fps=30):
+
+        self.adb_client = adb_client
+
+        self.screen_width = width
+        self.screen_height = height
+
+        # frames are downscaled by the decoder, vision runs at this scale (see Bot._to_device_locations)
+        working_scale = config["SpriteLocator"]["WorkingScale"] or 1.0
+        self.frame_width = int(width * working_scale)
+        self.frame_height = int(height * working_scale)
+
+        self.frame_buffer = FrameBuffer.get_instance()
+
+        # frames go to FrameBuffer by the decoder (passive mode) or through grab_frame (active mode)
+        self.is_running = False
+
+        self._latest_frame = None
+        self._frame_ready = threading.Condition()
+
+        self._processes = []
+        self._decoder = None
+
+    def start(self):
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self._start_decoder()
+
+    def stop(self):
+        if self._decoder is not None:
+            self.is_running = False
+
+            TaskManager.stop_task(self._decoder.name)
+            self._kill_processes()
+            self._decoder.join()
+            self._decoder = None
+
+    def grab_frame(self, timeout=5):
+        """
+        Get the latest decoded frame, only waiting for the first frame of the stream.
+        The same frame is returned until the screen changes (screenrecord sends no frame meanwhile).
+
+        Returns:
+            Frame
+        """
+        self._start_decoder()
+
+        with self._frame_ready:
+            self._frame_ready.wait_for(lambda: self._latest_frame is not None, timeout=timeout)
+
+            if self._latest_frame is None:
+                raise ADBStreamFrameGrabberError("No frame received from screen stream")
+
+            return self._latest_frame
+
+    def _start_decoder(self):
+        if self._decoder is not None:
+            return
+
+        def _worker(task):
+            while task.alive:
+                try:
+                    self._decode_stream(task)
+                except Exception as ex:
+                    logger.error(f"Screen stream failed: {ex}")
+                finally:
+                    self._kill_processes()
+
+                if task.alive:
+                    logger.debug("Screen stream ended, reconnecting.")
+                    sleep(RECONNECT_DELAY)
+
+        self._decoder = TaskManager.create_task("stream-frame-grabber-worker", target=_worker)
+        self._decoder.start()
+
+    def _decode_stream(self, task):
+        recorder = self.adb_client.exec_out_stream(
+            f"screenrecord --output-format=h264 --bit-rate {SCREENRECORD_BIT_RATE} "
+            f"--size {self.screen_width}x{self.screen_height} --time-limit {SCREENRECORD_TIME_LIMIT} -")
+
+        if recorder is None:
+            raise ADBStreamFrameGrabberError("ADB server is not started")
+
+        decoder = subprocess.Popen([
+            _FFMPEG_COMMAND, "-loglevel", "error",
+            "-flags", "low_delay", "-probesize", "32", "-f", "h264", "-i", "pipe:0",
+            "-s", f"{self.frame_width}x{self.frame_height}", "-pix_fmt", "gray", "-f", "rawvideo", "pipe:1"
+        ], stdin=recorder.stdout, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        # decoder owns the pipe now
+        recorder.stdout.close()
+        self._processes = [recorder, decoder]
+
+        frame_size = self.frame_width * self.frame_height
+
+        while task.alive:
+            buffer = _read_exactly(decoder.stdout, frame_size)
+
+            if buffer is None:
+                return
+
+            frame_data = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(self.frame_height, self.frame_width)
+            self._hand_off(Frame(frame_data, previous_frame=self._latest_frame))
+
+    def _hand_off(self, frame):
+        with self._frame_ready:
+            self._latest_frame = frame
+            self._frame_ready.notify_all()
+
+        if self.is_running:
+            self.frame_buffer.add_frame(frame)
+
+    def _kill_processes(self):
+        for process in self._processes:
+            if process.poll() is None:
+                process.kill()
+
+        self._processes = []
+
+
+def _read_exactly(stream, size):
+    """
+    Read size bytes from stream into a new buffer, None if stream ends before
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+
+    while received < size:
+        count = stream.readinto(view[received:])
+
+        if not count:
+            return None
+
+        received += count
+
+    return buffer
@@ -1,10 +1,20 @@
 from time import time
+import itertools
+import re
 
 import numpy
 import cv2
 import imutils
 
 from ubot.utilities import extract_region_from_image
+from ubot.variant_cache import VariantCache
+
+
+# tiles (pixels) of the change metric of frames
+CHANGE_TILE_SIZE = 16
+
+# mean intensity difference for a tile to be changed
+CHANGE_TOLERANCE = 4
 
 
 class ImageError(BaseException):
@@ -13,9 +23,11 @@ class ImageError(BaseException):
 
 class Image:
 
-    def __init__(self, image_data, image_variants=None):
+    # weakref lets VariantCache drop variants of collected images
+    __slots__ = ("image_data", "__weakref__")
+
+    def __init__(self, image_data):
         self.image_data = image_data
-        self.image_variants = image_variants or dict()
 
     @property
     def shape(self):
@@ -29,35 +41,37 @@ class Image:
 
         return shape
 
+    def variant(self, name, factory):
+        """
+        Get variant of image (processed copy or data derived from it), built by factory() once
+        and kept in the shared VariantCache (bounded, evicted least recently used first)
+        """
+        return VariantCache.get_instance().get(self, name, factory)
+
     @property
     def grayscale(self):
-        if "grayscale" not in self.image_variants:
-            if len(self.shape) == 2:
-                self.image_variants["grayscale"] = self
-            else:
-                img = cv2.cvtColor(self.image_data, cv2.COLOR_BGR2GRAY)
-                self.image_variants["grayscale"] = Image(img)
+        if len(self.shape) == 2:
+            return self
 
-        return self.image_variants["grayscale"]
+        return self.variant("grayscale", lambda: Image(cv2.cvtColor(self.image_data, cv2.COLOR_BGR2GRAY)))
 
     @property
     def threshold(self):
-        if "threshold" not in self.image_variants:
+
+        def _threshold():
             img = self.grayscale.image_data
             img = img - cv2.erode(img, None)
             _, img = cv2.threshold(img, 50, 256, cv2.THRESH_BINARY)
-            self.image_variants["threshold"] = Image(img)
+            return Image(img)
 
-        return self.image_variants["threshold"]
+        return self.variant("threshold", _threshold)
 
     def resize(self, width=None, height=None):
         S_AUTO = "auto"
         width = width or S_AUTO
         height = height or S_AUTO
 
-        variant_name = f"{width}-{height}"
-
-        if variant_name not in self.image_variants:
+        def _resize():
             if height == S_AUTO:
                 img = imutils.resize(self.image_data, width=int(width))
             elif width == S_AUTO:
@@ -65,9 +79,42 @@ class Image:
             else:
                 img = imutils.resize(self.image_data, width=int(width), height=int(height))
 
-            self.image_variants[variant_name] = Image(img)
+            return Image(img)
+
+        return self.variant(f"{width}-{height}", _resize)
+
+    def pyramid(self, levels=1):
+        """
+        Downsample image by half for each level (Gaussian pyramid)
+        """
+        if levels <= 0:
+            return self
+
+        return self.variant(f"pyramid-{levels}", lambda: Image(cv2.pyrDown(self.pyramid(levels - 1).image_data)))
 
-        return self.image_variants[variant_name]
+    def tile_signature(self, tile_size=16):
+        """
+        Mean intensity of each tile (tile_size x tile_size pixels) of grayscale image. The whole
+        image is covered: the last row and column of tiles are partial when its size is not a
+        multiple of tile_size (padded by repeating the edge pixels).
+
+        Returns
+        -------
+        numpy.ndarray
+            float32 array of shape (rows, columns)
+        """
+
+        def _tile_signature():
+            width, height = self.shape[:2]
+            columns, rows = -(-width // tile_size), -(-height // tile_size)
+
+            img = cv2.copyMakeBorder(self.grayscale.image_data, 0, rows * tile_size - height,
+                                     0, columns * tile_size - width, cv2.BORDER_REPLICATE)
+            img = cv2.resize(img, (columns, rows), interpolation=cv2.INTER_AREA)
+
+            return img.astype(numpy.float32)
+
+        return self.variant(f"tiles-{tile_size}", _tile_signature)
 
     def to_file(self, filepath):
         cv2.imwrite(filepath, self.image_data)
@@ -79,17 +126,36 @@ class Image:
 
 class Sprite(Image):
 
-    def __init__(self, name, image_data):
+    __slots__ = ("name", "metadata")
+
+    def __init__(self, name, image_data, metadata=None):
         super().__init__(image_data)
         self.name = name
+        self.metadata = metadata or dict()
+
+    @property
+    def region(self):
+        """
+        Search region (x, y, width, height) declared in sprite's metadata, None if not declared
+        """
+        region = self.metadata.get("region", None)
+        return tuple(region) if region is not None else None
+
+    @property
+    def anchor(self):
+        """
+        Fixed location (x, y) the sprite always renders at, declared in sprite's metadata, None if not declared
+        """
+        anchor = self.metadata.get("anchor", None)
+        return tuple(anchor) if anchor is not None else None
 
     def append_image_data(self, image_data):
         raise NotImplementedError()
 
     @staticmethod
-    def frompath(path, name=None):
+    def frompath(path, name=None, metadata=None):
         name = name or re.split(r"[/\\]", path)[-1]
-        return Sprite(name, cv2.imread(path))
+        return Sprite(name, cv2.imread(path), metadata=metadata)
 
     @staticmethod
     def frombuffer(buffer, name=None):
@@ -104,30 +170,105 @@ class Sprite(Image):
     def resize(sprite, new_name=None, width=None, height=None):
         new_name = new_name or f"{sprite.name}-resized"
         image = sprite.resize(width=width, height=height)
-        return Sprite(new_name, image.image_data)
+        return Sprite(new_name, image.image_data, metadata=dict(sprite.metadata))
+
+    @staticmethod
+    def rescale(sprite, scale):
+        """
+        Scale sprite and the coordinates of its metadata (region, anchor) to a working scale,
+        see SpriteLocator.WorkingScale in config
+        """
+        width, height = sprite.shape[:2]
+        size = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+        image_data = cv2.resize(sprite.image_data, size, interpolation=cv2.INTER_AREA)
+
+        metadata = dict(sprite.metadata)
+
+        for key in ("region", "anchor"):
+            if metadata.get(key, None) is not None:
+                metadata[key] = [int(round(value * scale)) for value in metadata[key]]
+
+        if metadata.get("anchor_tolerance", None) is not None:
+            metadata["anchor_tolerance"] = int(numpy.ceil(metadata["anchor_tolerance"] * scale))
+
+        return Sprite(sprite.name, image_data, metadata=metadata)
 
     @staticmethod
     def copy(sprite, new_name=None):
         new_name = new_name or f"{sprite.name}-copy"
-        return Sprite(new_name, sprite.image_data.copy())
+        return Sprite(new_name, sprite.image_data.copy(), metadata=dict(sprite.metadata))
 
 
 class Frame(Image):
+    """
+    Frame captured from screen. Only the tile signature of the previous frame is kept (a few KB,
+    usually already computed), not the previous frame itself, so a frame is freed as soon as it
+    leaves the FrameBuffer. Change from the previous frame is computed when read.
+
+    Attributes:
+        sequence (int): Number of frame, increasing in order of creation.
+        timestamp (float): Time frame was created at.
+        matches (dict): Results of SpriteLocator on this frame, see MatchCache.
+    """
+
+    __slots__ = ("sequence", "timestamp", "matches", "_similarity", "_previous_signature")
 
     def __init__(self, image_data, previous_frame=None, similarity=None):
         super().__init__(image_data)
 
-        self.previous_frame = previous_frame
-        if self.previous_frame is not None:
-            self._calc_difference()
-
-        if similarity is not None:
-            self.similarity = similarity
+        self._similarity = similarity
+        self._previous_signature = previous_frame.tile_signature(CHANGE_TILE_SIZE) if previous_frame is not None else None
 
+        self.sequence = next(_frame_sequence)
         self.timestamp = time()
 
-    def _calc_difference(self):
-        matches = cv2.matchTemplate(self.image_data, self.previous_frame.image_data, cv2.TM_CCOEFF_NORMED)
-        _, similarity, _, _ = cv2.minMaxLoc(matches)
+        self.matches = dict()
+
+    @property
+    def similarity(self):
+        """
+        Similarity with previous frame (1.0 means unchanged), from mean absolute difference of tile
+        signatures (CHANGE_TILE_SIZE pixels tiles). Computed on first read, None if there was no
+        previous frame.
+        """
+        if self._similarity is None and self._previous_signature is not None:
+            difference = self._tile_difference()
+            self._similarity = 1.0 - float(difference.mean()) / 255 if difference is not None else 0.0
+
+        return self._similarity
+
+    def change_map(self, tolerance=CHANGE_TOLERANCE):
+        """
+        Map of tiles (CHANGE_TILE_SIZE pixels) which changed since the previous frame
+
+        Returns
+        -------
+        numpy.ndarray
+            bool array of shape (rows, columns), None if there was no previous frame
+        """
+        if self._previous_signature is None:
+            return None
+
+        difference = self._tile_difference()
+
+        if difference is None:
+            return numpy.ones_like(self.tile_signature(CHANGE_TILE_SIZE), dtype=bool)
+
+        return difference > tolerance
+
+    def _tile_difference(self):
+        signature = self.tile_signature(CHANGE_TILE_SIZE)
+
+        if signature.shape != self._previous_signature.shape:
+            return None
+
+        return cv2.absdiff(signature, self._previous_signature)
+
+    def release(self):
+        """
+        Drop cached data of frame (called when frame leaves FrameBuffer)
+        """
+        self.matches.clear()
+
 
-        self.similarity = similarity
+_frame_sequence = itertools.count()
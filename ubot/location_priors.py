@@ -0,0 +1,125 @@
+import threading
+from collections import Counter
+
+from ubot.coordinates import as_coordinate
+from ubot.utilities import save_json, load_json
+
+
+class LocationPriors:
+    """
+    Remember where each sprite was found (a few hot regions per sprite), so that
+    later searches try these small regions first and only scan the whole frame on a miss.
+    Hot regions are tried most frequent first, and the least recently found one is
+    replaced when a sprite is found somewhere new.
+
+    Attributes:
+        path (string): File the priors are persisted to.
+        max_regions (int): Maximum number of hot regions kept per sprite.
+        margin (int): Pixels a hot region is expanded by when searching in it.
+    """
+
+    def __init__(self, path=None, max_regions=4, margin=8):
+        self.path = path
+        self.max_regions = max_regions
+        self.margin = margin
+
+        # sprite name -> list of [x, y, width, height, count]
+        self.regions = dict()
+
+        self.hits = Counter()
+        self.misses = Counter()
+
+        self._lock = threading.Lock()
+
+    def hot_regions(self, sprite_name):
+        """
+        Get regions to search sprite in first, most frequent first
+
+        Returns:
+            array of tuple(x, y, width, height)
+        """
+        with self._lock:
+            regions = sorted(self.regions.get(sprite_name, []), key=lambda region: -region[4])
+
+        return [(x - self.margin, y - self.margin, width + 2 * self.margin, height + 2 * self.margin)
+                for x, y, width, height, _ in regions]
+
+    def record(self, sprite_name, location):
+        """
+        Record location (x, y, width, height) sprite was found at
+        """
+        location = as_coordinate(location)
+
+        with self._lock:
+            regions = self.regions.setdefault(sprite_name, [])
+
+            for index, region in enumerate(regions):
+                x, y, width, height, count = region
+                search_region = (x - self.margin, y - self.margin, width + 2 * self.margin, height + 2 * self.margin)
+
+                if location.inside(*search_region):
+                    region[4] = count + 1
+
+                    # regions are kept least recently found first
+                    regions.append(regions.pop(index))
+                    return
+
+            # a new region evicts the least recently found one (not the least frequent, so that
+            # locations are learned again after the layout changed)
+            regions.append([*location.array[:4], 1])
+            del regions[:-self.max_regions]
+
+    def record_hit(self, sprite_name):
+        with self._lock:
+            self.hits[sprite_name] += 1
+
+    def record_miss(self, sprite_name):
+        with self._lock:
+            self.misses[sprite_name] += 1
+
+    def stats(self, sprite_name=None):
+        """
+        Get hit rate of priors (searches which found the sprite in a hot region)
+
+        Args:
+            sprite_name: string optional(df=None)
+                Sprite to inspect, all sprites if not provided
+
+        Returns:
+            dict - sprite name -> dict(hits, misses, hit_rate, regions)
+        """
+        with self._lock:
+            names = [sprite_name] if sprite_name is not None else sorted(set(self.regions) | set(self.hits) | set(self.misses))
+
+            stats = dict()
+
+            for name in names:
+                hits, misses = self.hits[name], self.misses[name]
+
+                stats[name] = dict(
+                    hits=hits,
+                    misses=misses,
+                    hit_rate=hits / (hits + misses) if hits + misses else 0.0,
+                    regions=[tuple(region) for region in self.regions.get(name, [])]
+                )
+
+        return stats if sprite_name is None else stats[sprite_name]
+
+    def save(self, file_path=None):
+        file_path = file_path or self.path
+
+        if file_path is None:
+            return
+
+        with self._lock:
+            save_json(file_path, self.regions)
+
+    @staticmethod
+    def load(file_path, **kwargs):
+        """
+        Load priors from file, empty priors (which will be saved to this file) if file does not exist
+        """
+        priors = LocationPriors(path=file_path, **kwargs)
+        priors.regions = load_json(file_path, default=dict())
+
+        return priors
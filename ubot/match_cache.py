@@ -0,0 +1,111 @@
+import threading
+
+
+class MatchCache:
+    """
+    Memoize results of SpriteLocator.locate per frame.
+
+    Results are stored on the frame itself (Frame.matches), keyed by sprite's
+    name and normalized options, so they are dropped together with the frame
+    when it leaves the FrameBuffer (see Frame.release).
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    def get(self, frame, sprite, options):
+        """
+        Get cached locations, None if not cached
+        """
+        return self.lookup(frame, self._make_key(frame, sprite, options))
+
+    def put(self, frame, sprite, options, locations):
+        self.store(frame, self._make_key(frame, sprite, options), locations)
+
+    def lookup(self, frame, key):
+        """
+        Get cached locations by a key made beforehand (see make_query_key), None if not cached
+        """
+        if key is None or getattr(frame, "matches", None) is None:
+            return None
+
+        locations = frame.matches.get(key, None)
+
+        with self._lock:
+            if locations is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return None if locations is None else list(locations)
+
+    def store(self, frame, key, locations):
+        if key is not None and getattr(frame, "matches", None) is not None:
+            frame.matches[key] = tuple(locations)
+
+    def stats(self):
+        """
+        Returns
+        -------
+        dict
+            hits, misses and hit_rate of the cache
+        """
+        total = self.hits + self.misses
+
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / total if total else 0.0
+        )
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _make_key(self, frame, sprite, options):
+        if getattr(frame, "matches", None) is None:
+            return None
+
+        return make_query_key(sprite, options)
+
+
+DEFAULT_OPTIONS = dict(
+    im_mode=None,
+    im_scale=None,
+    best_match=True,
+    threshold=None,
+    pyramid=None,
+    prefilter=False,
+    use_global_location=True
+)
+
+
+def make_query_key(sprite, options):
+    """
+    Make hashable key of a query from sprite's name, its metadata (which holds
+    per-sprite defaults such as region or anchor) and normalized options,
+    None if sprite has no name
+    """
+    name = getattr(sprite, "name", None)
+
+    if name is None:
+        return None
+
+    options = {**DEFAULT_OPTIONS, **options}
+    metadata = getattr(sprite, "metadata", None) or dict()
+
+    return (name, _hashable(metadata), tuple(sorted((k, _hashable(v)) for k, v in options.items())))
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+
+    return value
@@ -6,14 +6,21 @@ from pathlib import Path
 
 import re
 import types
+import json
 
 from ubot import logger
 from ubot.config import config
 from ubot.image import Sprite
+from ubot.location_priors import LocationPriors
+from ubot.autotune import load_tuned_options, TUNED_OPTIONS_FILE
 
 from ubot.settings import DEVELOPMENT_MODE_ACTIVE
 
 
+# directory (inside package) to store data learned while running the package
+LEARNED_DATA_DIR = ".ubot"
+
+
 class PackageError(BaseException):
     pass
 
@@ -25,11 +32,21 @@ class Package:
         self.package_path = package_path
         self.package_module = module
 
+        self.config = config
+
+        # vision runs at this scale of device resolution (frames are downscaled on capture)
+        self.working_scale = config["SpriteLocator"]["WorkingScale"] or 1.0
+
         self.sprites = self._discorver_sprites()
 
-        self.logger = logger
+        # locations learned at another scale would not match, keep priors per scale
+        priors_filename = "location-priors.json" if self.working_scale == 1.0 else f"location-priors-{self.working_scale}.json"
+        self.priors = LocationPriors.load(path.join(package_path, LEARNED_DATA_DIR, priors_filename))
 
-        self.config = config
+        self.tuned_options_path = path.join(package_path, LEARNED_DATA_DIR, TUNED_OPTIONS_FILE)
+        self._apply_tuned_options()
+
+        self.logger = logger
 
     def execute(self):
         if callable(self.package_module.init):
@@ -59,7 +76,11 @@ class Package:
 
         for sprite_path in sprites_path.rglob("*.png"):
             sprite_name = "/".join([p for p in sprite_path.parts if p not in sprites_path.parts]).lower().replace(".png", "")
-            sprite = Sprite.frompath(str(sprite_path), name=sprite_name)
+            sprite_metadata = _load_sprite_metadata(sprite_path.with_suffix(".json"))
+            sprite = Sprite.frompath(str(sprite_path), name=sprite_name, metadata=sprite_metadata)
+
+            if self.working_scale != 1.0:
+                sprite = Sprite.rescale(sprite, self.working_scale)
 
             if sprite_name not in sprites:
                 sprites[sprite_name] = sprite
@@ -68,6 +89,46 @@ class Package:
 
         return sprites
 
+    def _apply_tuned_options(self):
+        """
+        Set options found by autotune as sprites' default options
+        """
+        for sprite_name, options in load_tuned_options(self.tuned_options_path).items():
+            if sprite_name in self.sprites:
+                self.sprites[sprite_name].metadata["tuned"] = options
+
+
+def _load_sprite_metadata(metadata_path):
+    """
+    Load sprite's sidecar metadata file (same name as sprite, with .json extension)
+
+    Example:
+        sprites/menu/button_battle.png
+        sprites/menu/button_battle.json -> {"region": [1000, 560, 280, 160]}
+        sprites/menu/button_home.json -> {"anchor": [24, 16], "anchor_tolerance": 2}
+
+    Args:
+        metadata_path: Path
+
+    Return:
+        dict or None
+    """
+    if not metadata_path.is_file():
+        return None
+
+    with open(metadata_path, "r") as metadata_file:
+        metadata = json.load(metadata_file)
+
+    region = metadata.get("region", None)
+    if region is not None and len(region) != 4:
+        raise PackageError(f"Region of sprite '{metadata_path}' must be in form [x, y, width, height]")
+
+    anchor = metadata.get("anchor", None)
+    if anchor is not None and len(anchor) != 2:
+        raise PackageError(f"Anchor of sprite '{metadata_path}' must be in form [x, y]")
+
+    return metadata
+
 
 class PackageToolkit:
 
@@ -102,11 +163,12 @@ class PackageToolkit:
         return ocr
 
     def gen_coords(self):
-        from ubot.coordinates import as_coordinate, filter_coord, filter_similar_coords
+        from ubot.coordinates import as_coordinate, filter_coord, filter_similar_coords, non_max_suppression
         return types.SimpleNamespace(
             as_coordinate=as_coordinate,
             filter_coord=filter_coord,
-            filter_similar_coords=filter_similar_coords
+            filter_similar_coords=filter_similar_coords,
+            non_max_suppression=non_max_suppression
         )
 
     def gen_utils(self):
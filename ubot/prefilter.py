@@ -0,0 +1,115 @@
+import itertools
+
+import numpy
+import cv2
+
+
+TILE_SIZE = 64
+
+# minimum share of sprite's pixels in a color bin for the bin to be checked
+MIN_BIN_FRACTION = 0.05
+
+# share of the sprite's pixels of a bin the frame must have in the same bin (or its neighbors)
+TOLERANCE = 0.5
+
+# shape of histograms by number of channels
+HISTOGRAM_SHAPES = {1: (16,), 3: (4, 4, 4)}
+
+
+def histogram(image_data):
+    """
+    Coarse color histogram: 64 bins (4 levels per channel) for BGR, 16 bins for grayscale
+    """
+    if image_data.ndim == 2:
+        return cv2.calcHist([image_data], [0], None, [16], [0, 256]).ravel()
+
+    return cv2.calcHist([image_data], [0, 1, 2], None, [4, 4, 4], [0, 256] * 3).ravel()
+
+
+def color_signature(frame):
+    """
+    Color histogram of each tile (TILE_SIZE x TILE_SIZE pixels) of frame, cached in frame's variants
+
+    Returns:
+        numpy.ndarray of shape (rows, columns, bins)
+    """
+
+    def _color_signature():
+        image_data = frame.image_data
+        height, width = image_data.shape[:2]
+
+        return numpy.array([
+            [histogram(image_data[y:y + TILE_SIZE, x:x + TILE_SIZE]) for x in range(0, width, TILE_SIZE)]
+            for y in range(0, height, TILE_SIZE)
+        ])
+
+    return frame.variant("color-signature", _color_signature)
+
+
+def sprite_histogram(sprite, channels):
+    """
+    Color histogram of sprite, with the same number of channels as the frame it is compared to
+    """
+
+    def _sprite_histogram():
+        image_data = sprite.image_data
+
+        if image_data.ndim == 3 and channels == 1:
+            image_data = sprite.grayscale.image_data
+        elif image_data.ndim == 2 and channels == 3:
+            image_data = cv2.cvtColor(image_data, cv2.COLOR_GRAY2BGR)
+
+        return histogram(image_data[..., :3] if image_data.ndim == 3 else image_data)
+
+    return sprite.variant(f"color-histogram-{channels}", _sprite_histogram)
+
+
+def may_contain(frame, sprite, region=None, scale=1.0):
+    """
+    Cheap necessary condition for sprite to be on frame: every significant color bin of sprite
+    has enough pixels on frame (in tiles covering region).
+
+    Args:
+        frame: Frame
+        sprite: Sprite
+        region: tuple(x, y, width, height) optional(df=None)
+        scale: float optional(df=1.0) - smallest scale the sprite may be matched at
+
+    Returns:
+        boolean - False if sprite surely is not on frame
+    """
+    frame_data = frame.image_data
+
+    if frame_data.ndim == 3 and frame_data.shape[2] != 3:
+        return True
+
+    signature = color_signature(frame)
+
+    if region is not None:
+        x, y, width, height = region
+        signature = signature[y // TILE_SIZE:(y + height - 1) // TILE_SIZE + 1, x // TILE_SIZE:(x + width - 1) // TILE_SIZE + 1]
+
+    channels = 1 if frame_data.ndim == 2 else 3
+
+    # a small brightness shift moves pixels to a neighbouring bin, count neighbors of each bin too
+    frame_histogram = _neighborhood_sum(signature.sum(axis=(0, 1)), HISTOGRAM_SHAPES[channels])
+    sprite_hist = sprite_histogram(sprite, channels)
+
+    significant = sprite_hist >= sprite_hist.sum() * MIN_BIN_FRACTION
+    required = sprite_hist[significant] * (scale ** 2) * TOLERANCE
+
+    return bool(numpy.all(frame_histogram[significant] >= required))
+
+
+def _neighborhood_sum(hist, shape):
+    """
+    Sum of each bin and its neighbors (one bin away along each channel)
+    """
+    hist = hist.reshape(shape)
+    padded = numpy.pad(hist, 1)
+    total = numpy.zeros_like(hist)
+
+    for offsets in itertools.product(range(3), repeat=len(shape)):
+        total += padded[tuple(slice(offset, offset + size) for offset, size in zip(offsets, shape))]
+
+    return total.ravel()
@@ -0,0 +1,77 @@
+import re
+import threading
+
+from ubot.utilities import save_json, load_json
+
+
+class ScaleMemory:
+    """
+    Remember which template scale (index in the scales of im_scale) matched each sprite,
+    per frame size, so that multi-scale searches try that scale and its neighbors first
+    and only sweep every scale on a miss. The scale never changes on a given device, so
+    memories are persisted per device.
+
+    Attributes:
+        path (string): File the scales are persisted to.
+        neighbors (int): Scales on each side of the remembered one tried first.
+    """
+
+    def __init__(self, path=None, neighbors=1):
+        self.path = path
+        self.neighbors = neighbors
+
+        # sprite name -> "<width>x<height>@<im_scale>" -> index of scale
+        self.scales = dict()
+
+        self._lock = threading.Lock()
+
+    def candidates(self, sprite_name, frame_size, im_scale, count):
+        """
+        Get indices of scales to try first, remembered one first, empty if nothing is remembered
+
+        Returns:
+            array of int
+        """
+        with self._lock:
+            index = self.scales.get(sprite_name, {}).get(_make_key(frame_size, im_scale), None)
+
+        if index is None or index >= count:
+            return []
+
+        neighbors = [i for offset in range(1, self.neighbors + 1) for i in (index - offset, index + offset)]
+        return [index] + [i for i in neighbors if 0 <= i < count]
+
+    def record(self, sprite_name, frame_size, im_scale, index):
+        with self._lock:
+            self.scales.setdefault(sprite_name, dict())[_make_key(frame_size, im_scale)] = int(index)
+
+    def save(self, file_path=None):
+        file_path = file_path or self.path
+
+        if file_path is None:
+            return
+
+        with self._lock:
+            save_json(file_path, self.scales)
+
+    @staticmethod
+    def load(file_path, **kwargs):
+        """
+        Load scales from file, empty memory (which will be saved to this file) if file does not exist
+        """
+        memory = ScaleMemory(path=file_path, **kwargs)
+        memory.scales = load_json(file_path, default=dict())
+
+        return memory
+
+    @staticmethod
+    def device_filename(serial):
+        """
+        Get name of file to persist scales of device (serial may be "127.0.0.1:5555")
+        """
+        return "scales-{0}.json".format(re.sub(r"[^\w.-]", "_", serial or "default"))
+
+
+def _make_key(frame_size, im_scale):
+    width, height = frame_size[:2]
+    return f"{width}x{height}@{im_scale}"
@@ -1,27 +1,247 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from time import perf_counter
+import threading
+import os
+
 import numpy
 import cv2
 
 from ubot import logger
-from ubot.coordinates import as_coordinate, filter_similar_coords
+from ubot.coordinates import as_coordinate, non_max_suppression
+from ubot.match_cache import MatchCache, make_query_key
+from ubot.features import compute_features, match_features, FRAME_FEATURES, SPRITE_FEATURES, FEATURE_MIN_MATCHES
+from ubot.exact_match import match_exact
+from ubot.prefilter import may_contain, color_signature
+from ubot.template_bank import TemplateBank
+from ubot.settings import SIMILARITY_DEFAULT
+from ubot.image import Image
+from ubot.utilities import find_peaks
+from ubot.variant_cache import VariantCache
+
+
+PYRAMID_MIN_SIZE = 8
+PYRAMID_CANDIDATES = 5
+NMS_DISTANCE = 10
+
+ENGINE_TEMPLATE = "template"
+ENGINE_FEATURE = "feature"
+ENGINE_EXACT = "exact"
+
+INCREMENTAL_TILE_SIZE = 16
+INCREMENTAL_TOLERANCE = 4
+INCREMENTAL_MAX_CHANGES = 0.5
 
 
 class SpriteLocator:
 
-    def __init__(self, **kwargs):
-        pass
+    def __init__(self, workers=None, priors=None, scales=None, default_options=None, **kwargs):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
 
-    def locate_in_region(self, sprite=None, screen_frame=None, threshold=None, return_best=False, screen_region=None, use_global_location=True):
-        region_or_list = self.locale(sprite, screen_frame, threshold, return_best)
+        # options used when neither the call nor sprite's tuned options (see autotune) set them
+        self.default_options = default_options or dict()
+
+        # LocationPriors, hot regions tried first before searching the whole frame
+        self.priors = priors
+
+        # ScaleMemory, scale of im_scale which matched each sprite, tried first
+        self.scales = scales
+
+        self.match_cache = MatchCache()
+
+        self._incremental_states = dict()
+
+        self._counters = Counter()
+        self._counters_lock = threading.Lock()
+
+        # sprite name -> [hits, attempts, seconds spent] of locate_first, to order its candidates
+        self._first_stats = dict()
+
+    def stats(self):
+        """
+        Returns
+        -------
+        dict
+            Counters of locator, for inspecting effect of optimizations
+        """
+        return dict(
+            cache=self.match_cache.stats(),
+            counters=dict(self._counters),
+            priors=self.priors.stats() if self.priors is not None else dict(),
+            variants=VariantCache.get_instance().stats(),
+            first={name: dict(hits=hits, attempts=attempts, cost=seconds / attempts if attempts else None)
+                   for name, (hits, attempts, seconds) in self._first_stats.items()}
+        )
+
+    def _resolve_options(self, sprite, options):
+        """
+        Merge options of call over sprite's tuned options (metadata "tuned") over locator's default options
+        """
+        tuned = getattr(sprite, "metadata", {}).get("tuned", None) or dict()
+        return {**self.default_options, **tuned, **options}
+
+    def _count(self, name):
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def locate_many(self, sprites, screen_frame, **options):
+        """
+        Locate multiple sprites on the same frame, spread over a bounded thread pool
+        (cv2.matchTemplate releases the GIL so sprites are matched in parallel).
+
+        Parameter
+        ---------
+        sprites:
+            array of Sprite
+
+        screen_frame:
+            Frame
+
+        options:
+            dict (optional)
+                Same options as `locate`, applied to every sprite.
+
+        Returns
+        -------
+        array
+            Array of results of `locate`, in the same order as sprites
+        """
+        if len(sprites) <= 1 or self.workers <= 1:
+            return [self.locate(sprite, screen_frame, **options) for sprite in sprites]
+
+        self._prebuild_frame(screen_frame, [self._resolve_options(sprite, options) for sprite in sprites],
+                             any(_engine(sprite, options) == ENGINE_FEATURE for sprite in sprites))
 
-        if screen_region is None:
-            return region_or_list
+        futures = [self._get_executor().submit(self.locate, sprite, screen_frame, **options) for sprite in sprites]
+        return [future.result() for future in futures]
 
-        if use_global_location:
-            screen_region = as_coordinate(screen_region)
-            return screen_region.traslate(region_or_list) if return_best else \
-                    [screen_region.traslate(region) for region in region_or_list]
+    def locate_first(self, sprites, screen_frame, **options):
+        """
+        Locate sprites one by one and stop at the first one found, e.g. to tell which screen
+        a frame shows. Candidates are tried in order of hit rate / cost (seconds per locate)
+        measured on previous calls, so the likely and cheap ones go first.
 
-        return region_or_list
+        Parameter
+        ---------
+        sprites:
+            array of Sprite
+
+        screen_frame:
+            Frame
+
+        options:
+            dict (optional)
+                Same options as `locate`, applied to every sprite. Should have threshold,
+                otherwise the first candidate always "matches" at its best location.
+
+        Returns
+        -------
+        tuple(Sprite, array)
+            First sprite found and its locations, (None, []) if none is found
+        """
+        for sprite in sorted(sprites, key=self._first_priority, reverse=True):
+            started = perf_counter()
+            locations = self.locate(sprite, screen_frame, **options)
+            self._record_first(sprite, len(locations) > 0, perf_counter() - started)
+
+            if len(locations) > 0:
+                return sprite, locations
+
+        return None, []
+
+    def _first_priority(self, sprite):
+        hits, attempts, seconds = self._first_stats.get(sprite.name, (0, 0, 0.0))
+
+        # untried sprites get an even chance at the average cost, so they are tried early
+        hit_rate = (hits + 1) / (attempts + 2)
+        cost = seconds / attempts if attempts else self._average_first_cost()
+
+        return hit_rate / max(cost, 1e-6)
+
+    def _average_first_cost(self):
+        attempts = sum(stats[1] for stats in self._first_stats.values())
+        seconds = sum(stats[2] for stats in self._first_stats.values())
+
+        return seconds / attempts if attempts else 1.0
+
+    def _record_first(self, sprite, hit, seconds):
+        with self._counters_lock:
+            stats = self._first_stats.setdefault(sprite.name, [0, 0, 0.0])
+            stats[0] += int(hit)
+            stats[1] += 1
+            stats[2] += seconds
+
+    def prepare(self, sprite_or_list, **options):
+        """
+        Compile a query: resolve options (call over tuned over default options), region, cache key
+        and templates (im_mode, every scale of im_scale) of sprites once, so calling the query with
+        a frame only does the matching. Meant for hot frame handler loops.
+
+        Parameter
+        ---------
+        sprite_or_list:
+            Sprite or array of Sprite
+
+        options:
+            dict (optional)
+                Same options as `locate`, bound to the query.
+
+        Returns
+        -------
+        PreparedQuery
+            query(frame) -> result of `locate` (one sprite) or of `locate_many` (array of sprites)
+        """
+        return PreparedQuery(self, sprite_or_list, options)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sprite-locator")
+
+        return self._executor
+
+    def _prebuild_frame(self, screen_frame, resolved_options, use_features):
+        """
+        Build the frame variants shared by sprites once, before workers race to build them
+        """
+        for im_mode in set(options.get("im_mode", None) for options in resolved_options):
+            _apply_im_mode(screen_frame, im_mode)
+
+        if any(options.get("prefilter", False) for options in resolved_options):
+            color_signature(screen_frame)
+
+        if use_features:
+            compute_features(screen_frame, FRAME_FEATURES)
+
+    def bank(self, sprites, **options):
+        """
+        Group same-size sprites into a TemplateBank, scored against a frame in one shared coarse pass
+
+        Parameter
+        ---------
+        sprites:
+            array of Sprite (same size)
+
+        options:
+            dict (optional)
+                im_mode:
+                    string, default(locator's default im_mode)
+
+        Returns
+        -------
+        TemplateBank
+            bank.match(frame, region=None, threshold=None) -> dict of sprite name -> array of region
+        """
+        return TemplateBank(sprites, im_mode=options.get("im_mode", self.default_options.get("im_mode", None)))
+
+    def locate_in_region(self, sprite=None, screen_frame=None, threshold=None, return_best=False, screen_region=None, use_global_location=True):
+        regions = self.locate(sprite, screen_frame, threshold=threshold, best_match=return_best,
+                              region=screen_region, use_global_location=use_global_location)
+
+        if return_best:
+            return regions[0] if len(regions) else None
+
+        return regions
 
     # def locate(self, sprite=None, screen_frame=None, threshold=None, return_best=False):
     #     frame = screen_frame.image_data
@@ -83,6 +303,9 @@ class SpriteLocator:
                 im_scale:
                     float, defaule(None)
                     Set scale of image to be resized then matching with all resized image.
+                    With threshold and when the locator has a ScaleMemory, the scale which matched the sprite
+                    last time (on the same frame size) and its neighbors are tried first, and all scales only
+                    on a miss.
 
                 best_match:
                     bool, default(True)
@@ -92,71 +315,590 @@ class SpriteLocator:
                     float, default(Max)
                     Threshold of similarity to be filter. Default to max of similarity if not provided.
 
+                pyramid:
+                    int, default(None)
+                    Number of pyramid levels (each halves the size) to match frame and sprite at
+                    before refining the best candidates at full resolution. Coarse matching costs
+                    about 1/4^levels of a full match, so levels=2 is roughly 10x cheaper per scale.
+                    The trade-off is accuracy: details thinner than 2^levels pixels are lost at the
+                    coarse level, so small or low-contrast sprites may be missed. Levels are reduced
+                    automatically when the sprite would become smaller than PYRAMID_MIN_SIZE.
+
+                pyramid_candidates:
+                    int, default(5)
+                    Number of coarse candidates refined at full resolution. With best_match=False,
+                    at most this many distinct locations can be found per scale.
+
+                region:
+                    tuple(x, y, width, height), default(sprite.region)
+                    Only search inside this region of the frame. Defaults to the region declared in
+                    sprite's metadata, pass None to search the whole frame.
+
+                use_global_location:
+                    bool, default(True)
+                    Return locations relative to the whole frame instead of the searched region.
+
+                use_cache:
+                    bool, default(True)
+                    Reuse result of the same query (sprite's name and options) on the same frame.
+
+                incremental:
+                    bool, default(False)
+                    Only match again where the frame changed (tiles of INCREMENTAL_TILE_SIZE pixels)
+                    since the last frame this query ran on, and reuse the previous matches elsewhere.
+                    Cost is roughly proportional to on-screen change. Requires threshold.
+
+                anchor:
+                    tuple(x, y), default(sprite.anchor)
+                    Location the sprite always renders at. Only the patch at this location is compared
+                    (checksum, then similarity of the patch alone), falling back to a normal search if
+                    it does not match. An anchored sprite is found at most once.
+
+                anchor_tolerance:
+                    int, default(sprite.metadata["anchor_tolerance"] or 0)
+                    Pixels the anchored sprite may be off its anchor.
+
+                engine:
+                    string, default(sprite.metadata["engine"] or "template")
+                    Locator engine:
+                        "template" - correlation, options above.
+                        "exact" - pixel-identical occurrences only (im_mode is applied, im_scale is not),
+                            using a rare-pixel seed and integral image prefilter. Far cheaper than correlation
+                            with threshold=SIMILARITY_EXACT_MATCH for crisp UI assets. Frames of lossless capture modes are
+                            converted to grayscale the same way as sprites (im_mode="grayscale").
+                        "feature" - ORB keypoints, tolerates scaling and rotation of the sprite so im_scale is
+                            not needed. Keypoints of a frame are computed once and shared by all sprites
+                            located on it. Finds at most one location, needs textured sprites and ignores
+                            threshold (see feature_min_matches).
+
+                feature_min_matches:
+                    int, default(FEATURE_MIN_MATCHES)
+                    Minimum number of consistent keypoint matches for the feature engine.
+
+                prefilter:
+                    bool, default(sprite.metadata["prefilter"] or False)
+                    Skip matching when a coarse color histogram shows the sprite cannot be on the frame
+                    (or in its region), e.g. a red icon on a frame without red. Histograms of a frame are
+                    computed once per frame (per tile). Only applies with threshold, not to the feature
+                    engine. Pixels of the neighbouring bins count too, so small brightness shifts pass,
+                    but strongly dimmed sprites may still be rejected. Rejections are counted in stats().
+
+                use_priors:
+                    bool, default(True)
+                    When the locator has LocationPriors, search the sprite's hot regions (where it was
+                    found before) first and the whole frame only on a miss. Only applies to best match
+                    searches with threshold over the whole frame.
+
         Returns
         -------
         array
             Array of region(x, y, width, height) of found locations
         '''
-        templates = []
+        options = self._resolve_options(sprite, options)
+        use_cache = options.pop("use_cache", True)
 
-        if "im_mode" in options:
-            im_mode = options["im_mode"]
+        return self._locate_cached(sprite, screen_frame, options, make_query_key(sprite, options) if use_cache else None)
 
-            if im_mode == "threshold":
-                sprite = sprite.threshold
-                screen_frame = screen_frame.threshold
+    def _locate_cached(self, sprite, screen_frame, options, key):
+        """
+        Locate with resolved options, through the match cache unless key is None
+        """
+        locations = self.match_cache.lookup(screen_frame, key)
 
-            elif im_mode == "grayscale":
-                sprite = sprite.grayscale
-                screen_frame = screen_frame.grayscale
+        if locations is not None:
+            return locations
+
+        locations = self._locate(sprite, screen_frame, **options)
+        self.match_cache.store(screen_frame, key, locations)
 
-        if "im_scale" in options:
-            im_scale = options["im_scale"]
-            tW, tH = (-1, -1)
+        return locations
 
-            for scale in numpy.linspace(im_scale, 1, num=10):
-                template = sprite.resize(width=int(sprite.shape[0] * scale))
+    def _locate(self, sprite, screen_frame, **options):
+        region = options["region"] if "region" in options else getattr(sprite, "region", None)
 
-                if template.shape == (tW, tH):
-                    continue
-                else:
-                    tW, tH = template.shape
-                    templates.append(template)
+        if region is not None:
+            region = _clip_region(region, screen_frame.shape[:2])
 
+        get_min_max = options.get("best_match", True)
+
+        anchor = options["anchor"] if "anchor" in options else getattr(sprite, "anchor", None)
+        anchor_match = self._match_anchor(sprite, screen_frame, anchor, options) if anchor is not None else None
+
+        if anchor_match is not None:
+            matches = [anchor_match]
+        elif self._rejected_by_prefilter(sprite, screen_frame, region, options):
+            matches = []
+        elif _engine(sprite, options) == ENGINE_FEATURE:
+            matches = match_features(sprite, screen_frame, region=region,
+                                     min_matches=options.get("feature_min_matches", FEATURE_MIN_MATCHES))
+        elif _engine(sprite, options) == ENGINE_EXACT:
+            im_mode = options.get("im_mode", None)
+            matches = match_exact(_apply_im_mode(sprite, im_mode), _apply_im_mode(screen_frame, im_mode), region=region)
+        elif options.get("incremental", False) and options.get("threshold", None) is not None:
+            matches = self._match_incremental(sprite, screen_frame, region, options)
+        elif self._use_priors(sprite, region, options):
+            matches = self._match_with_priors(sprite, screen_frame, options)
         else:
-            templates = [sprite]
+            matches = self._match(sprite, screen_frame, region, options)
+
+        locations = _select_matches(matches, get_min_max)
+
+        if region is not None and not options.get("use_global_location", True):
+            locations = [as_coordinate(location).translate(-region[0], -region[1]).array for location in locations]
+
+        return locations
+
+    def _match(self, sprite, screen_frame, region, options, get_min_max=None):
+        """
+        Match sprite (all its templates) inside region of frame
+
+        Returns
+        -------
+        array
+            Array of tuple(region, score), region in frame coordinates
+        """
+        templates = _make_templates(sprite, options)
+
+        frame_size = screen_frame.shape[:2]
+        screen_frame = _apply_im_mode(screen_frame, options.get("im_mode", None))
+
+        if region is not None:
+            screen_frame = screen_frame.extract_region(*region)
 
         # match template
-        get_min_max = options.get("best_match", True)
+        if get_min_max is None:
+            get_min_max = options.get("best_match", True)
+
         threshold = options.get("threshold", None)
 
-        locations = []
+        def _match_scales(indices):
+            return [(match, index) for index in indices
+                    for match in self._match_scale(screen_frame, templates[index], options, get_min_max, threshold)]
+
+        # try the scale which matched last time (and its neighbors) first, sweep all scales on a miss
+        im_scale = options.get("im_scale", None)
+        use_scales = self.scales is not None and im_scale is not None and threshold is not None and len(templates) > 1
+
+        remembered = self.scales.candidates(sprite.name, frame_size, im_scale, len(templates)) if use_scales else []
+        scored = _match_scales(remembered)
+
+        if len(remembered) > 0:
+            self._count("scale_hits" if len(scored) > 0 else "scale_misses")
+
+        if len(scored) == 0:
+            scored = _match_scales([index for index in range(len(templates)) if index not in remembered])
+
+        if use_scales and len(scored) > 0:
+            self.scales.record(sprite.name, frame_size, im_scale, max(scored, key=lambda item: item[0][1])[1])
+
+        matches = [match for match, _ in scored]
+
+        if region is not None:
+            matches = [((x + region[0], y + region[1], w, h), score) for (x, y, w, h), score in matches]
+
+        return matches
+
+    def _match_scale(self, screen_frame, template, options, get_min_max, threshold):
+        pyramid = options.get("pyramid", None)
+
+        if pyramid:
+            return self._match_template_pyramid(screen_frame, template, pyramid,
+                                                options.get("pyramid_candidates", PYRAMID_CANDIDATES),
+                                                get_min_max=get_min_max, threshold=threshold)
+
+        return self._match_template(screen_frame, template, get_min_max=get_min_max, threshold=threshold)
+
+    def _match_anchor(self, sprite, screen_frame, anchor, options):
+        """
+        Compare only the patch at sprite's anchor, instead of searching the whole frame
+
+        Returns
+        -------
+        tuple(region, score)
+            or None if sprite is not at its anchor
+        """
+        tolerance = options.get("anchor_tolerance", getattr(sprite, "metadata", {}).get("anchor_tolerance", 0))
+        threshold = options.get("threshold", None) or SIMILARITY_DEFAULT
+
+        template = _apply_im_mode(sprite, options.get("im_mode", None))
+        frame = _apply_im_mode(screen_frame, options.get("im_mode", None))
+
+        x, y = (int(i) for i in anchor[:2])
+        width, height = template.shape[:2]
+
+        patch_x, patch_y = max(x - tolerance, 0), max(y - tolerance, 0)
+        patch = frame.image_data[patch_y:y + height + tolerance, patch_x:x + width + tolerance]
+
+        if patch.shape[:2] == template.image_data.shape[:2] and numpy.array_equal(patch, template.image_data):
+            self._count("anchor_hits")
+            return (x, y, width, height), 1.0
+
+        if patch.shape[0] >= height and patch.shape[1] >= width:
+            ccnorm = cv2.matchTemplate(patch, template.image_data, cv2.TM_CCOEFF_NORMED)
+            _, score, _, location = cv2.minMaxLoc(ccnorm)
+
+            if numpy.isfinite(score) and score >= threshold:
+                self._count("anchor_hits")
+                return (patch_x + location[0], patch_y + location[1], width, height), score
+
+        self._count("anchor_misses")
+        return None
+
+    def _rejected_by_prefilter(self, sprite, screen_frame, region, options):
+        prefilter = options["prefilter"] if "prefilter" in options else getattr(sprite, "metadata", {}).get("prefilter", False)
+
+        if not prefilter or options.get("threshold", None) is None or \
+           _engine(sprite, options) == ENGINE_FEATURE:
+            return False
+
+        scale = options.get("im_scale", None) or 1.0
+
+        if may_contain(screen_frame, sprite, region=region, scale=min(scale, 1.0)):
+            self._count("prefilter_passes")
+            return False
+
+        self._count("prefilter_rejections")
+        return True
+
+    def _use_priors(self, sprite, region, options):
+        return self.priors is not None and options.get("use_priors", True) and region is None and \
+               options.get("best_match", True) and options.get("threshold", None) is not None and \
+               getattr(sprite, "name", None) is not None
+
+    def _match_with_priors(self, sprite, screen_frame, options):
+        """
+        Match sprite in its hot regions first, then in the whole frame, recording where it is found
+        """
+        frame_size = screen_frame.shape[:2]
+
+        for hot_region in self.priors.hot_regions(sprite.name):
+            matches = self._match(sprite, screen_frame, _clip_region(hot_region, frame_size), options)
+
+            if len(matches):
+                self.priors.record_hit(sprite.name)
+                self.priors.record(sprite.name, matches[0][0])
+                return matches
+
+        self.priors.record_miss(sprite.name)
+
+        matches = self._match(sprite, screen_frame, None, options)
+
+        if len(matches):
+            self.priors.record(sprite.name, max(matches, key=lambda match: match[1])[0])
+
+        return matches
+
+    def _match_incremental(self, sprite, screen_frame, region, options):
+        """
+        Match sprite only in tiles changed since the frame this query was last run on,
+        reuse previous matches everywhere else
+        """
+        key = make_query_key(sprite, options)
+
+        if key is None:
+            return self._match(sprite, screen_frame, region, options)
+
+        signature = screen_frame.tile_signature(INCREMENTAL_TILE_SIZE)
+
+        previous_signature, previous_matches = self._incremental_states.get(key, (None, None))
+
+        if previous_signature is None or previous_signature.shape != signature.shape:
+            # all candidates are kept (not only the best), later changes may remove the best one
+            matches = self._match(sprite, screen_frame, region, options, get_min_max=False)
+
+        else:
+            changed = numpy.abs(signature - previous_signature) > INCREMENTAL_TOLERANCE
+
+            if not changed.any():
+                matches = previous_matches
 
-        for template in templates:
-            result = self._match_template(screen_frame, template, get_min_max=get_min_max, threshold=threshold)
-            locations += [r for r in result if r is not None]
+            elif changed.mean() > INCREMENTAL_MAX_CHANGES:
+                matches = self._match(sprite, screen_frame, region, options, get_min_max=False)
 
-        return filter_similar_coords(locations, 10)
+            else:
+                margin = max(sprite.shape[:2])
+                dirty_regions = _dirty_regions(changed, INCREMENTAL_TILE_SIZE, margin, region or (0, 0, *screen_frame.shape[:2]))
+
+                def _overlaps_change(match):
+                    return any(not as_coordinate(match[0]).outside(*changed_region) for changed_region, _ in dirty_regions)
+
+                matches = [match for match in previous_matches if not _overlaps_change(match)]
+
+                for _, search_region in dirty_regions:
+                    matches += [match for match in self._match(sprite, screen_frame, search_region, options, get_min_max=False)
+                                if _overlaps_change(match)]
 
+        self._incremental_states[key] = (signature, matches)
+
+        return matches
 
     def _match_template(self, frame, template, get_min_max=True, threshold=None):
+        """
+        Returns
+        -------
+        array
+            Array of tuple(region, score) of matched locations
+        """
+        if not _fits(frame, template):
+            return []
+
         ccnorm = cv2.matchTemplate(frame.image_data, template.image_data, cv2.TM_CCOEFF_NORMED)
 
         if get_min_max:
             _, score, _, location = cv2.minMaxLoc(ccnorm)
 
-            if threshold is None:
-                return [(*location, *template.shape[:2])]
+            if threshold is not None and score < threshold:
+                return []
+
+            return [((*location, *template.shape[:2]), score)]
+
+        if threshold is None:
+            threshold = ccnorm.max()
+
+        return _local_maxima(ccnorm, threshold, template.shape[:2])
+
+    def _match_template_pyramid(self, frame, template, levels, candidates, get_min_max=True, threshold=None):
+        if not _fits(frame, template):
+            return []
+
+        width, height = template.shape[:2]
+
+        while levels > 0 and min(width, height) >> levels < PYRAMID_MIN_SIZE:
+            levels -= 1
+
+        if levels == 0:
+            return self._match_template(frame, template, get_min_max=get_min_max, threshold=threshold)
+
+        factor = 2 ** levels
+        margin = factor * 2
+        frame_width, frame_height = frame.shape[:2]
+
+        coarse = cv2.matchTemplate(frame.pyramid(levels).image_data, template.pyramid(levels).image_data, cv2.TM_CCOEFF_NORMED)
+
+        # refine each coarse candidate inside a small full resolution window
+        windows = []
+
+        for coarse_x, coarse_y in find_peaks(coarse, candidates, width >> levels, height >> levels):
+            x = min(max(coarse_x * factor - margin, 0), frame_width - width)
+            y = min(max(coarse_y * factor - margin, 0), frame_height - height)
+            x_end = min(coarse_x * factor + width + margin, frame_width)
+            y_end = min(coarse_y * factor + height + margin, frame_height)
+
+            window = frame.image_data[y:y_end, x:x_end]
+            ccnorm = cv2.matchTemplate(window, template.image_data, cv2.TM_CCOEFF_NORMED)
+            windows.append((x, y, ccnorm))
+
+        if len(windows) == 0:
+            return []
+
+        if get_min_max:
+            best_score, best_location = -1, None
+
+            for x, y, ccnorm in windows:
+                _, score, _, location = cv2.minMaxLoc(ccnorm)
+
+                if score > best_score:
+                    best_score, best_location = score, (x + location[0], y + location[1])
+
+            if threshold is not None and best_score < threshold:
+                return []
+
+            return [((*best_location, *template.shape[:2]), best_score)]
+
+        if threshold is None:
+            threshold = max(ccnorm.max() for _, _, ccnorm in windows)
+
+        matches = []
+
+        for x, y, ccnorm in windows:
+            matches += [((x + mx, y + my, mw, mh), score)
+                        for (mx, my, mw, mh), score in _local_maxima(ccnorm, threshold, template.shape[:2])]
+
+        return matches
+
+
+class PreparedQuery:
+    """
+    Query compiled by SpriteLocator.prepare, call it with a frame to locate its sprites
+
+    Example:
+        query = locator.prepare([battle_button, home_button], threshold=0.9, region=(0, 600, 1280, 120))
+
+        for frame in frames:
+            battle, home = query(frame)
+    """
+
+    def __init__(self, locator, sprite_or_list, options):
+        self.locator = locator
+        self.single = not isinstance(sprite_or_list, (list, tuple))
+        self.sprites = [sprite_or_list] if self.single else list(sprite_or_list)
+
+        self.queries = []
+
+        for sprite in self.sprites:
+            sprite_options = locator._resolve_options(sprite, options)
+            use_cache = sprite_options.pop("use_cache", True)
+
+            # warm variants of sprite so the first frame does not pay for them
+            if _engine(sprite, sprite_options) == ENGINE_FEATURE:
+                compute_features(sprite, SPRITE_FEATURES)
             else:
-                return [(*location, *template.shape[:2])] if score >= threshold else [None]
+                _make_templates(sprite, sprite_options)
+
+            key = make_query_key(sprite, sprite_options) if use_cache else None
+            self.queries.append((sprite, sprite_options, key))
 
+        self._resolved_options = [sprite_options for _, sprite_options, _ in self.queries]
+        self._use_features = any(_engine(sprite, sprite_options) == ENGINE_FEATURE for sprite, sprite_options, _ in self.queries)
+
+    def __call__(self, screen_frame):
+        locator = self.locator
+
+        if len(self.queries) <= 1 or locator.workers <= 1:
+            results = [locator._locate_cached(sprite, screen_frame, options, key) for sprite, options, key in self.queries]
         else:
-            locations = []
+            locator._prebuild_frame(screen_frame, self._resolved_options, self._use_features)
 
-            if threshold is None:
-                threshold = ccnorm.max()
+            executor = locator._get_executor()
+            futures = [executor.submit(locator._locate_cached, sprite, screen_frame, options, key)
+                       for sprite, options, key in self.queries]
+            results = [future.result() for future in futures]
 
-            for location in zip(*numpy.where(ccnorm >= threshold)[::-1]):
-                locations.append((int(location[0]), int(location[1]), *template.shape[:2]))
+        return results[0] if self.single else results
 
-            return locations
+
+def _make_templates(sprite, options):
+    """
+    Get templates (sprite processed by im_mode, resized for each scale of im_scale) to match,
+    kept in sprite's variants so the scale loop runs once per sprite and im_scale
+    """
+    sprite = _apply_im_mode(sprite, options.get("im_mode", None))
+
+    if options.get("im_scale", None) is None:
+        return [sprite]
+
+    def _templates():
+        templates = []
+        tW, tH = (-1, -1)
+
+        for scale in numpy.linspace(options["im_scale"], 1, num=10):
+            # Sprite.resize is a static copy helper, use the variant cache of Image
+            template = Image.resize(sprite, width=int(sprite.shape[0] * scale))
+
+            if template.shape[:2] == (tW, tH):
+                continue
+            else:
+                tW, tH = template.shape[:2]
+                templates.append(template)
+
+        return templates
+
+    return sprite.variant(f"templates-{options['im_scale']}", _templates)
+
+
+def _dirty_regions(changed, tile_size, margin, search_region):
+    """
+    Get regions to be matched again from map of changed tiles
+
+    Returns
+    -------
+    array
+        Array of tuple(changed region, search region): bounding box of a group of changed tiles,
+        and the same box expanded by margin (so every location overlapping it is covered),
+        both clipped to the search region
+    """
+    count, _, stats, _ = cv2.connectedComponentsWithStats(changed.astype(numpy.uint8), connectivity=8)
+
+    regions = []
+
+    for tile_x, tile_y, tile_width, tile_height, _ in stats[1:count]:
+        box = (tile_x * tile_size, tile_y * tile_size, tile_width * tile_size, tile_height * tile_size)
+
+        changed_region = _intersect_regions(box, search_region)
+        search = _intersect_regions((box[0] - margin, box[1] - margin, box[2] + 2 * margin, box[3] + 2 * margin), search_region)
+
+        if changed_region is not None and search is not None:
+            regions.append((changed_region, search))
+
+    return regions
+
+
+def _intersect_regions(region, other):
+    x, y = max(region[0], other[0]), max(region[1], other[1])
+    x_end = min(region[0] + region[2], other[0] + other[2])
+    y_end = min(region[1] + region[3], other[1] + other[3])
+
+    if x_end <= x or y_end <= y:
+        return None
+
+    return int(x), int(y), int(x_end - x), int(y_end - y)
+
+
+def _select_matches(matches, get_min_max):
+    """
+    Reduce tuple(region, score) matches (from all scales) to locations: the best one,
+    or the strongest of each cluster (non-maximum suppression), strongest first.
+    """
+    if len(matches) == 0:
+        return []
+
+    if get_min_max:
+        return [max(matches, key=lambda match: match[1])[0]]
+
+    regions, scores = zip(*matches)
+    return non_max_suppression(regions, scores, NMS_DISTANCE)
+
+
+def _local_maxima(ccnorm, threshold, size):
+    """
+    Extract peaks of similarity map above threshold (vectorized), so plateaus
+    around a match do not produce hundreds of neighbouring hits.
+
+    Returns
+    -------
+    array
+        Array of tuple(region, score)
+    """
+    peaks = (ccnorm >= threshold) & (ccnorm >= cv2.dilate(ccnorm, None))
+    ys, xs = numpy.nonzero(peaks)
+
+    return [((int(x), int(y), *size), float(score)) for x, y, score in zip(xs, ys, ccnorm[ys, xs])]
+
+
+def _engine(sprite, options):
+    if "engine" in options:
+        return options["engine"]
+
+    return getattr(sprite, "metadata", {}).get("engine", ENGINE_TEMPLATE)
+
+
+def _apply_im_mode(image, im_mode):
+    """
+    Get variant of image processed by im_mode
+    """
+    if im_mode == "threshold":
+        return image.threshold
+
+    if im_mode == "grayscale":
+        return image.grayscale
+
+    return image
+
+
+def _fits(frame, template):
+    """
+    Check template is not bigger than frame (may happen when searching in a small region)
+    """
+    return frame.shape[0] >= template.shape[0] and frame.shape[1] >= template.shape[1]
+
+
+def _clip_region(region, frame_size):
+    """
+    Clip region (x, y, width, height) to be inside frame
+    """
+    x, y, width, height = (int(i) for i in region)
+    frame_width, frame_height = frame_size
+
+    x, y = min(max(x, 0), frame_width), min(max(y, 0), frame_height)
+
+    return x, y, min(width, frame_width - x), min(height, frame_height - y)
@@ -0,0 +1,158 @@
+import cv2
+
+from ubot.utilities import find_peaks
+
+
+# smallest side (pixels) of templates at the coarse level of the shared pass
+BANK_MIN_SIZE = 8
+
+# most pyramid levels (each halves the size) of the shared pass
+BANK_MAX_LEVELS = 2
+
+# coarse candidates of each template confirmed at full resolution
+BANK_CANDIDATES = 3
+
+
+class TemplateBankError(BaseException):
+    pass
+
+
+class TemplateBank:
+    """
+    Same-size sprites (digit fonts, card icons, item slots...) checked against a frame together.
+    The frame is reduced once (pyramid level shared with pyramid searches through the frame's
+    variants) and every template is scored on the reduced frame, where matching costs a fraction
+    of a full resolution match. The best coarse candidates of each template are then confirmed in
+    small full resolution windows, so scores are the same as cv2.TM_CCOEFF_NORMED.
+
+    A bank costs a few single matches, not one per sprite. Nothing is kept per frame: the only
+    memory of the bank is its templates.
+
+    Attributes:
+        names (array): Names of sprites in the bank.
+        size (tuple): Width, height shared by every sprite.
+        levels (int): Pyramid levels of the shared pass, 0 when sprites are too small to reduce.
+    """
+
+    def __init__(self, sprites, im_mode=None):
+        if len(sprites) == 0:
+            raise TemplateBankError("Template bank needs at least one sprite")
+
+        templates = [_to_single_channel(sprite, im_mode) for sprite in sprites]
+
+        shapes = set(template.shape for template in templates)
+        if len(shapes) > 1:
+            raise TemplateBankError(f"Sprites of a template bank must have the same size, got {shapes}")
+
+        self.names = [sprite.name for sprite in sprites]
+        self.im_mode = im_mode
+
+        width, height = templates[0].shape[:2]
+        self.size = (width, height)
+
+        self.levels = BANK_MAX_LEVELS
+        while self.levels > 0 and min(width, height) >> self.levels < BANK_MIN_SIZE:
+            self.levels -= 1
+
+        self._templates = [template.image_data for template in templates]
+        self._coarse_templates = [template.pyramid(self.levels).image_data for template in templates]
+
+    def match(self, frame, region=None, threshold=None):
+        """
+        Find best match of every sprite of the bank
+
+        Parameter
+        ---------
+        frame:
+            Frame
+
+        region:
+            tuple(x, y, width, height) - optional
+            Only search inside this region of the frame.
+
+        threshold:
+            float - optional
+            Best matches with lower similarity are dropped.
+
+        Returns
+        -------
+        dict
+            Sprite name -> array of region(x, y, width, height), empty or with the best match
+        """
+        image = _to_single_channel(frame, self.im_mode)
+        region_x, region_y, region_width, region_height = region or (0, 0, *image.shape[:2])
+
+        width, height = self.size
+
+        if region_width < width or region_height < height:
+            return {name: [] for name in self.names}
+
+        results = dict()
+
+        for name, template, coarse_template in zip(self.names, self._templates, self._coarse_templates):
+            score, location = self._best_match(image, (region_x, region_y, region_width, region_height),
+                                               template, coarse_template)
+
+            if location is None or (threshold is not None and score < threshold):
+                results[name] = []
+            else:
+                results[name] = [(*location, width, height)]
+
+        return results
+
+    def _best_match(self, image, region, template, coarse_template):
+        """
+        Best location of template inside region of image: scored at the coarse level of the bank,
+        then confirmed at full resolution around the best coarse candidates
+
+        Returns
+        -------
+        tuple
+            score, location(x, y) in frame coordinates (None if not found)
+        """
+        region_x, region_y, region_width, region_height = region
+        width, height = self.size
+        levels = self.levels
+
+        factor = 2 ** levels
+        coarse = image.pyramid(levels).image_data[region_y // factor:(region_y + region_height) // factor,
+                                                  region_x // factor:(region_x + region_width) // factor]
+
+        if levels == 0 or coarse.shape[0] < coarse_template.shape[0] or coarse.shape[1] < coarse_template.shape[1]:
+            window = image.image_data[region_y:region_y + region_height, region_x:region_x + region_width]
+            _, score, _, (x, y) = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+
+            return score, (region_x + x, region_y + y)
+
+        coarse_scores = cv2.matchTemplate(coarse, coarse_template, cv2.TM_CCOEFF_NORMED)
+
+        margin = factor * 2
+        region_end_x, region_end_y = region_x + region_width, region_y + region_height
+        best_score, best_location = -1, None
+
+        for coarse_x, coarse_y in find_peaks(coarse_scores, BANK_CANDIDATES, width >> levels, height >> levels):
+            x = (region_x // factor + coarse_x) * factor
+            y = (region_y // factor + coarse_y) * factor
+
+            window_x = min(max(x - margin, region_x), region_end_x - width)
+            window_y = min(max(y - margin, region_y), region_end_y - height)
+            window_end_x = min(x + width + margin, region_end_x)
+            window_end_y = min(y + height + margin, region_end_y)
+
+            window = image.image_data[window_y:window_end_y, window_x:window_end_x]
+            _, score, _, (match_x, match_y) = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+
+            if score > best_score:
+                best_score, best_location = score, (window_x + match_x, window_y + match_y)
+
+        return best_score, best_location
+
+
+def _to_single_channel(image, im_mode):
+    if im_mode is not None:
+        image = getattr(image, im_mode)
+
+    if image.image_data.ndim == 3:
+        image = image.grayscale
+
+    return image
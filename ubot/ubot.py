@@ -7,6 +7,8 @@ import argparse
 __version__ = "0.0.1-dev"
 
 valid_commands = [
+    "autotune",
+    "benchmark",
     "help",
     "isolate-sprite",
     "launch",
@@ -39,6 +41,52 @@ def executable_help():
     print("")
 
 
+def autotune(package_path, frames_path, *args):
+    parser = argparse.ArgumentParser(prog="ubot autotune")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--im-scale", type=float, default=None, help="Also try scaled templates down to this scale")
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args(args)
+
+    from ubot import package_loader
+    from ubot.autotune import run_autotune, format_results
+    from ubot.settings import SIMILARITY_DEFAULT
+
+    package = package_loader.load_package(package_path)
+
+    results = run_autotune(package, frames_path, threshold=args.threshold or SIMILARITY_DEFAULT,
+                           im_scale=args.im_scale, repeat=args.repeat)
+
+    print(format_results(results))
+    print(f"\nTuned options saved to '{package.tuned_options_path}'")
+
+
+def benchmark(corpus_path, *args):
+    parser = argparse.ArgumentParser(prog="ubot benchmark")
+    parser.add_argument("--output", default=None, help="Write machine readable results (json) to this file")
+    parser.add_argument("--baseline", default=None, help="Results (json) of a previous run to compare with")
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args(args)
+
+    import json
+    from ubot.benchmark import run_benchmark, compare_results, format_results
+
+    results = run_benchmark(corpus_path, repeat=args.repeat)
+
+    comparison = None
+    if args.baseline is not None:
+        with open(args.baseline, "r") as baseline_file:
+            comparison = compare_results(json.load(baseline_file), results)
+
+    print(format_results(results, comparison))
+
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(dict(results, comparison=comparison), output_file, indent=2)
+
+
 def isolate_sprite(sprites_path, output_path):
     from ubot.utilities import isolate_sprite
     isolate_sprite(sprites_path, output_path)
@@ -79,8 +127,8 @@ def visual_debugger(as_execute=True):
             from ubot.frame_buffer import FrameBuffer
             FrameBuffer.setup(config)
 
-            from ubot.adb_frame_grabber import ADBFrameGrabber
-            frame_grabber = ADBFrameGrabber(adb_client, config, width=width, height=height)
+            from ubot import frame_grabbers
+            frame_grabber = frame_grabbers.make(adb_client, config, width, height)
 
             frame_grabber.start()
 
@@ -98,6 +146,8 @@ def visual_debugger(as_execute=True):
 
 
 command_function_mapping = {
+    "autotune": autotune,
+    "benchmark": benchmark,
     "help": executable_help,
     "isolate-sprite": isolate_sprite,
     "launch": launch,
@@ -105,6 +155,8 @@ command_function_mapping = {
 }
 
 command_description_mapping = {
+    "autotune": "Find the fastest reliable matching options of each sprite of a package",
+    "benchmark": "Benchmark sprite locator over a recorded frame corpus",
     "help": "Print this to console",
     "isolate-sprite": "Isolating sprites from their background",
     "launch": "Launch package",
@@ -1,6 +1,7 @@
 import numpy as np
 import cv2
 
+import json
 import os
 
 
@@ -18,6 +19,50 @@ def draw_retangle(image, region_bounding_box, color=(0, 0, 255)):
     return img_data
 
 
+def find_peaks(ccnorm, count, width, height):
+    """
+    Find up to `count` best locations in a similarity map, suppressing the
+    neighborhood (size of the template) around each one already picked.
+    """
+    ccnorm = ccnorm.copy()
+    peaks = []
+
+    for _ in range(count):
+        _, score, _, (x, y) = cv2.minMaxLoc(ccnorm)
+
+        if score <= -1:
+            break
+
+        peaks.append((x, y))
+
+        ccnorm[max(y - height // 2, 0):y + height // 2 + 1, max(x - width // 2, 0):x + width // 2 + 1] = -1
+
+    return peaks
+
+
+def save_json(file_path, content):
+    """
+    Write content to JSON file, creating its directory
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(file_path, "w") as json_file:
+        json.dump(content, json_file)
+
+
+def load_json(file_path, default=None):
+    """
+    Read content of JSON file, default if file does not exist
+    """
+    if not os.path.isfile(file_path):
+        return default
+
+    with open(file_path, "r") as json_file:
+        return json.load(json_file)
+
+
 def first_or_none(array):
     if hasattr(array, "__iter__"):
         for o in array:
@@ -0,0 +1,184 @@
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy
+
+
+MEGABYTE = 1024 * 1024
+
+# budget when VariantCache is not setup with config
+DEFAULT_BUDGET = 256 * MEGABYTE
+
+# estimated bytes of objects the size of which cannot be measured (e.g. cv2.KeyPoint)
+OBJECT_SIZE = 64
+
+
+class VariantCache:
+    """
+    Variants of images (grayscale, resized, pyramid levels, features...) shared by every Image,
+    bounded by a memory budget with least recently used eviction.
+
+    Thread-safe, and a variant is built once: a thread asking for a variant another thread is
+    building waits for it instead of building it again. Variants of an image are dropped when
+    the image is garbage collected.
+
+    Attributes:
+        budget (int): Bytes of variants kept, least recently used ones are evicted over it.
+    """
+
+    config = None
+    instance = None
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # (id of image, variant name) -> tuple(variant, bytes), least recently used first
+        self._entries = OrderedDict()
+
+        # (id of image, variant name) -> threading.Event set once variant is built
+        self._pending = dict()
+
+        # id of image -> set of its variant names
+        self._owners = dict()
+
+        # reentrant, images may be garbage collected (dropping their variants) while the lock is held
+        self._lock = threading.RLock()
+
+    def get(self, image, name, factory):
+        """
+        Get variant of image, built by factory() if not cached
+
+        Args:
+            image: Image
+            name: string - name of variant
+            factory: function() -> variant
+
+        Return:
+            variant
+        """
+        key = (id(image), name)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key, None)
+
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+                event = self._pending.get(key, None)
+
+                if event is None:
+                    event = threading.Event()
+                    self._pending[key] = event
+                    self.misses += 1
+                    break
+
+            # built by another thread, check again (it may have failed or been evicted already)
+            event.wait()
+
+        try:
+            variant = factory()
+
+            with self._lock:
+                self._store(image, key, variant)
+
+            return variant
+
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Return:
+            dict - size and budget (bytes), number of entries, hits, misses and evictions
+        """
+        with self._lock:
+            return dict(
+                size=self.size,
+                budget=self.budget,
+                entries=len(self._entries),
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions
+            )
+
+    def _store(self, image, key, variant):
+        image_id, name = key
+
+        if image_id not in self._owners:
+            self._owners[image_id] = set()
+            weakref.finalize(image, self._drop_image, image_id)
+
+        nbytes = sizeof(variant)
+
+        self._entries[key] = (variant, nbytes)
+        self._owners[image_id].add(name)
+        self.size += nbytes
+
+        while self.size > self.budget and len(self._entries) > 1:
+            (evicted_id, evicted_name), (_, evicted_bytes) = self._entries.popitem(last=False)
+
+            self._owners.get(evicted_id, set()).discard(evicted_name)
+            self.size -= evicted_bytes
+            self.evictions += 1
+
+    def _drop_image(self, image_id):
+        with self._lock:
+            for name in self._owners.pop(image_id, ()):
+                _, nbytes = self._entries.pop((image_id, name), (None, 0))
+                self.size -= nbytes
+
+    @classmethod
+    def setup(cls, config):
+        cls.config = config
+
+        if cls.instance is not None:
+            cls.instance.budget = cls.config["VariantCache"]["Budget"] * MEGABYTE
+
+    @classmethod
+    def get_instance(cls):
+        if cls.instance is None:
+            budget = DEFAULT_BUDGET if cls.config is None else cls.config["VariantCache"]["Budget"] * MEGABYTE
+            cls.instance = VariantCache(budget=budget)
+
+        return cls.instance
+
+
+def sizeof(variant):
+    """
+    Estimate bytes held by variant
+    """
+    if isinstance(variant, numpy.ndarray):
+        return variant.nbytes
+
+    if hasattr(variant, "image_data"):
+        return variant.image_data.nbytes
+
+    if isinstance(variant, (list, tuple)):
+        return sum(sizeof(item) for item in variant)
+
+    if isinstance(variant, dict):
+        return sum(sizeof(item) for item in variant.values())
+
+    if variant is None or isinstance(variant, (int, float, str)):
+        return sys.getsizeof(variant)
+
+    return OBJECT_SIZE